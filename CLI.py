@@ -1,51 +1,169 @@
 import argparse
 import sys
 import json
-import aiohttp
+import shlex
 import asyncio
-from typing import Dict, Optional
+import contextlib
+import io
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Any
 
+# aiohttp и FunctionStorage импортируются лениво: простые команды запускаются быстрее,
+# а режиму --local сетевой клиент не нужен вовсе
+DEFAULT_URL = "http://localhost:8000"
 
-async def http_request(method: str, endpoint: str, data: Optional[Dict] = None) -> Dict:
-    """Отправка HTTP запроса к серверу"""
-    default_url = "http://localhost:8000"
-    url = f"{default_url}{endpoint}"
+
+class HttpBackend:
+    """Выполнение запросов к серверу по HTTP через одно соединение"""
+    
+    def __init__(self, url: str = DEFAULT_URL, concurrency: int = 1):
+        """
+        :param url: Адрес сервера
+        :param concurrency: Максимальное число одновременных соединений
+        """
+        self.url = url.rstrip("/")
+        self.concurrency = concurrency
+        self._session = None
     
-    async with aiohttp.ClientSession() as session:
+    async def request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Any:
+        import aiohttp
+        
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.concurrency))
+        
+        url = f"{self.url}{endpoint}"
+        method = method.upper()
+        ok_statuses = [200, 201] if method == "POST" else [200]
+        
         try:
-            if method.upper() == "GET":
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        error = await response.json()
-                        raise ValueError(f"HTTP {response.status}: {error.get('detail', 'Unknown error')}")
-            
-            elif method.upper() == "POST":
-                async with session.post(url, json=data) as response:
-                    if response.status in [200, 201]:
-                        return await response.json()
-                    else:
-                        error = await response.json()
-                        raise ValueError(f"HTTP {response.status}: {error.get('detail', 'Unknown error')}")
-            
-            elif method.upper() == "PUT":
-                async with session.put(url, json=data) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        error = await response.json()
-                        raise ValueError(f"HTTP {response.status}: {error.get('detail', 'Unknown error')}")
-            
-            elif method.upper() == "DELETE":
-                async with session.delete(url) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        error = await response.json()
-                        raise ValueError(f"HTTP {response.status}: {error.get('detail', 'Unknown error')}")
+            kwargs = {"json": data} if method in ("POST", "PUT") else {}
+            async with self._session.request(method, url, **kwargs) as response:
+                if response.status in ok_statuses:
+                    return await response.json()
+                else:
+                    error = await response.json()
+                    raise ValueError(f"HTTP {response.status}: {error.get('detail', 'Unknown error')}")
+        except Exception as e:
+            raise ValueError(f"Request failed: {str(e)}")
+    
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class LocalBackend:
+    """Выполнение запросов напрямую через FunctionStorage, без сервера"""
+    
+    def __init__(self, storage_file: str = "functions.json"):
+        """
+        :param storage_file: Файл хранилища функций
+        """
+        self.storage_file = storage_file
+        self._storage = None
+    
+    @property
+    def storage(self):
+        if self._storage is None:
+            from FunctionStorage import FunctionStorage
+            # Сообщения загрузки - в stderr, чтобы не смешивать их с выводом команд
+            with contextlib.redirect_stdout(sys.stderr):
+                self._storage = FunctionStorage(self.storage_file)
+        return self._storage
+    
+    def _get(self, name: str):
+        func = self.storage.get(name)
+        if not func:
+            raise ValueError(f"Function '{name}' not found")
+        return func
+    
+    async def request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Any:
+        try:
+            return self._dispatch(method, endpoint, data)
+        except ValueError:
+            raise
         except Exception as e:
             raise ValueError(f"Request failed: {str(e)}")
+    
+    def _dispatch(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Any:
+        """Сопоставление запроса с операцией хранилища (как в HTTPServer)"""
+        from FunctionStorage import ParametricFunction, ComposedFunction
+        
+        method = method.upper()
+        parts = [part for part in endpoint.split("/") if part]
+        if not parts or parts[0] != "functions":
+            raise ValueError(f"Unsupported endpoint: {endpoint}")
+        
+        if len(parts) == 1 and method == "GET":
+            return [{"name": f.name, "description": f.description} for f in self.storage.list()]
+        
+        if len(parts) == 1 and method == "POST":
+            if data.get("expression"):
+                func = ComposedFunction(
+                    name=data["name"],
+                    expression=data["expression"],
+                    resolver=self.storage.get,
+                    description=data.get("description", ""),
+                    input_signature=data.get("input_signature"),
+                    output_signature=data.get("output_signature"),
+                    parameters=data.get("parameters")
+                )
+            else:
+                func = ParametricFunction(
+                    name=data["name"],
+                    code=data["code"],
+                    description=data.get("description", ""),
+                    input_signature=data.get("input_signature"),
+                    output_signature=data.get("output_signature"),
+                    parameters=data.get("parameters")
+                )
+            self.storage.create(func)
+            return {"message": f"Function '{data['name']}' created successfully"}
+        
+        name = parts[1]
+        
+        if len(parts) == 2 and method == "GET":
+            func = self._get(name)
+            return dict(func.get_data(), code=func.code)
+        
+        if len(parts) == 2 and method == "PUT":
+            updated = self.storage.update(
+                name=name,
+                code=data.get("code"),
+                description=data.get("description"),
+                input_signature=data.get("input_signature"),
+                output_signature=data.get("output_signature"),
+                parameters=data.get("parameters"),
+                expression=data.get("expression")
+            )
+            if not updated:
+                raise ValueError(f"Function '{name}' not found")
+            return {"message": f"Function '{name}' updated successfully"}
+        
+        if len(parts) == 2 and method == "DELETE":
+            if not self.storage.delete(name):
+                raise ValueError(f"Function '{name}' not found")
+            return {"message": f"Function '{name}' deleted successfully"}
+        
+        if len(parts) == 3 and parts[2] == "compute" and method == "POST":
+            return self.storage.compute(name, data["x"], data.get("params", {}))
+        
+        if len(parts) == 3 and parts[2] == "data" and method == "GET":
+            return self._get(name).get_data()
+        
+        raise ValueError(f"Unsupported request: {method} {endpoint}")
+    
+    async def close(self):
+        pass
+
+
+# Текущий способ выполнения запросов (задаётся в main)
+_backend = HttpBackend()
+
+
+async def http_request(method: str, endpoint: str, data: Optional[Dict] = None) -> Dict:
+    """Отправка запроса к серверу (или к локальному хранилищу в режиме --local)"""
+    return await _backend.request(method, endpoint, data)
 
 
 async def create_function(args):
@@ -197,11 +315,20 @@ async def compute_function(args):
         results = await http_request("POST", f"/functions/{args.name}/compute", data)
         
         print(f"Results for function '{args.name}':")
-        for x_val, y_val in zip(x_values, results):
-            print(f"  f({x_val}) = {y_val}")
-        
-        if args.output and len(results) == 1:
-            print(f"\nOutput: {results[0]}")
+        if isinstance(results, dict):
+            # Несколько выходов приходят столбцами: {имя выхода: значения}
+            for i, x_val in enumerate(x_values):
+                values = ", ".join(f"{key}={column[i]}" for key, column in results.items())
+                print(f"  f({x_val}) = ({values})")
+            
+            if args.output and len(x_values) == 1:
+                print(f"\nOutput: {json.dumps({key: column[0] for key, column in results.items()})}")
+        else:
+            for x_val, y_val in zip(x_values, results):
+                print(f"  f({x_val}) = {y_val}")
+            
+            if args.output and len(results) == 1:
+                print(f"\nOutput: {results[0]}")
     
     except ValueError as e:
         print(f"Error: {e}")
@@ -222,7 +349,8 @@ async def get_data(args):
         sys.exit(1)
 
 
-async def main():
+def build_parser() -> argparse.ArgumentParser:
+    """Построение разборщика аргументов командной строки"""
     parser = argparse.ArgumentParser(
         description="CLI for Parametric Function Management System",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -248,9 +376,20 @@ Examples:
   
   # Список всех функций
   python CLI.py list
+  
+  # Работа с хранилищем напрямую, без сервера
+  python CLI.py --local compute --name "linear" --x "1,2,3"
+  
+  # Пакетное выполнение команд из файла (по одной на строку, в синтаксисе CLI или JSON)
+  python CLI.py batch --file commands.txt --concurrency 8
+  echo '{"command": "compute", "name": "linear", "x": [1, 2], "params": {"a": 2}}' | python CLI.py --local batch
         """
     )
     
+    parser.add_argument("--url", default=DEFAULT_URL, help="Server URL")
+    parser.add_argument("--local", action="store_true", help="Use FunctionStorage directly instead of the server")
+    parser.add_argument("--storage-file", default="functions.json", help="Storage file for --local mode")
+    
     subparsers = parser.add_subparsers(dest="command", help="Command to execute")
     
     create_parser = subparsers.add_parser("create", help="Create a new function")
@@ -288,24 +427,149 @@ Examples:
     data_parser = subparsers.add_parser("data", help="Get function data")
     data_parser.add_argument("--name", required=True, help="Function name")
     
+    batch_parser = subparsers.add_parser("batch", help="Run many commands from a file or stdin")
+    batch_parser.add_argument("--file", default="-", help="File with one command per line ('-' for stdin)")
+    batch_parser.add_argument("--concurrency", type=int, default=1, help="Number of commands run at once")
+    
+    return parser
+    
+
+
+def _json_command_to_argv(command: Dict[str, Any]) -> List[str]:
+    """Преобразование команды в формате JSON в аргументы командной строки"""
+    command = dict(command)
+    argv = [str(command.pop("command", ""))]
+    
+    for key, value in command.items():
+        flag = "--" + key.replace("_", "-")
+        if value is None or value is False:
+            continue
+        if value is True:
+            argv.append(flag)
+        elif key == "x" and isinstance(value, list):
+            argv += [flag, ",".join(str(v) for v in value)]
+        elif key == "params" and isinstance(value, dict):
+            argv += [flag] + [f"{k}={v}" for k, v in value.items()]
+        elif key == "params" and isinstance(value, list):
+            argv += [flag] + [str(v) for v in value]
+        elif isinstance(value, (dict, list)):
+            argv += [flag, json.dumps(value)]
+        else:
+            argv += [flag, str(value)]
+    
+    return argv
+
+
+def _parse_batch_line(parser: argparse.ArgumentParser, line: str) -> argparse.Namespace:
+    """Разбор одной строки пакета: объект JSON или команда в синтаксисе CLI"""
+    if line.startswith("{"):
+        argv = _json_command_to_argv(json.loads(line))
+    else:
+        argv = shlex.split(line)
+    
+    args = parser.parse_args(argv)
+    if args.command in (None, "batch"):
+        raise ValueError("Batch lines must contain a single non-batch command")
+    return args
+
+
+# Буфер вывода текущей пакетной команды (у каждой задачи asyncio - свой)
+_command_output: ContextVar[Optional[io.StringIO]] = ContextVar("command_output", default=None)
+
+
+class _BufferedStdout:
+    """Stdout, который внутри пакетной команды пишет в её буфер, а вне команд - в исходный поток"""
+    
+    def __init__(self, stream):
+        self._stream = stream
+    
+    def write(self, text: str) -> int:
+        buffer = _command_output.get()
+        return (buffer if buffer is not None else self._stream).write(text)
+    
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+
+async def run_batch(parser: argparse.ArgumentParser, args):
+    """Выполнить команды из файла или stdin через одно соединение или хранилище"""
+    if args.file == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(args.file, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    
+    commands = [(number, line.strip()) for number, line in enumerate(lines, 1)
+                if line.strip() and not line.strip().startswith("#")]
+    
+    semaphore = asyncio.Semaphore(max(1, args.concurrency))
+    failures = []
+    
+    async def run_one(number: int, line: str):
+        async with semaphore:
+            # Вывод команды копится отдельно и печатается целиком, чтобы при
+            # параллельном выполнении строки разных команд не перемешивались
+            buffer = io.StringIO()
+            _command_output.set(buffer)
+            try:
+                command_args = _parse_batch_line(parser, line)
+                await command_handlers[command_args.command](command_args)
+            except SystemExit as e:
+                if e.code:
+                    failures.append(number)
+            except Exception as e:
+                print(f"Error: line {number}: {e}")
+                failures.append(number)
+            finally:
+                _command_output.set(None)
+                sys.stdout.write(buffer.getvalue())
+                sys.stdout.flush()
+    
+    stdout = sys.stdout
+    sys.stdout = _BufferedStdout(stdout)
+    try:
+        await asyncio.gather(*(run_one(number, line) for number, line in commands))
+    finally:
+        sys.stdout = stdout
+    
+    print(f"Batch finished: {len(commands) - len(failures)} succeeded, {len(failures)} failed", file=sys.stderr)
+    if failures:
+        print(f"Failed lines: {', '.join(str(n) for n in sorted(failures))}", file=sys.stderr)
+        sys.exit(1)
+
+
+command_handlers = {
+    "create": create_function,
+    "get": get_function,
+    "update": update_function,
+    "delete": delete_function,
+    "list": list_functions,
+    "compute": compute_function,
+    "data": get_data
+}
+
+
+async def main():
+    global _backend
+    
+    parser = build_parser()
     args = parser.parse_args()
     
     if not args.command:
         parser.print_help()
         sys.exit(1)
     
-    command_handlers = {
-        "create": create_function,
-        "get": get_function,
-        "update": update_function,
-        "delete": delete_function,
-        "list": list_functions,
-        "compute": compute_function,
-        "data": get_data
-    }
+    concurrency = args.concurrency if args.command == "batch" else 1
+    _backend = LocalBackend(args.storage_file) if args.local else HttpBackend(args.url, concurrency)
     
-    await command_handlers[args.command](args)
+    try:
+        if args.command == "batch":
+            await run_batch(parser, args)
+        else:
+            await command_handlers[args.command](args)
+    finally:
+        await _backend.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
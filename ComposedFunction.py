@@ -0,0 +1,189 @@
+from typing import Dict, List, Any, Callable, Iterable, Optional, Set, Union
+import ast
+import math
+from ParametricFunction import ParametricFunction
+from FunctionAnalyzer import analyze, DETERMINISTIC_BUILTINS
+
+
+class _StageRenamer(ast.NodeTransformer):
+    """Замена имён хранимых функций в выражении на внутренние имена стадий"""
+
+    def __init__(self, stages: Dict[str, str]):
+        self.stages = stages
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Name) and node.func.id in self.stages:
+            node.func = ast.copy_location(ast.Name(id=self.stages[node.func.id], ctx=ast.Load()), node.func)
+        return node
+
+
+class ComposedFunction(ParametricFunction):
+    """Функция, заданная выражением над другими хранимыми функциями, например a*f(x) + b*g(h(x, k=2))"""
+
+    # Логические флаги анализатора, которые наследуются от стадий
+    INHERITED_FLAGS = ("pure", "deterministic", "uses_only_math", "branch_free", "loop_free",
+                       "cacheable", "vectorizable")
+
+    def __init__(self,
+                 name: str,
+                 expression: str,
+                 resolver: Callable[[str], Optional[ParametricFunction]],
+                 description: str = "",
+                 input_signature: Optional[Dict[str, str]] = None,
+                 output_signature: Optional[Dict[str, str]] = None,
+                 parameters: Optional[List[Dict[str, Any]]] = None):
+        """
+        :param name: Уникальное название функции
+        :param expression: Выражение над входом x, параметрами и хранимыми функциями
+        :param resolver: Поиск хранимой функции по имени
+        :param description: Опциональное описание функции
+        :param input_signature: Сигнатура входа (по умолчанию {"x": "float"} и параметры)
+        :param output_signature: Сигнатура выхода
+        :param parameters: Параметры композиции; если не заданы, выводятся из выражения
+        """
+        self.expression = expression
+        self._resolver = resolver
+        self._linked = False
+
+        try:
+            tree = ast.parse(expression.strip(), mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"Invalid composition expression: {e}")
+
+        if input_signature:
+            param_names = {p.get("name") for p in parameters or []}
+            inputs = [n for n in input_signature if n not in param_names] or ["x"]
+        else:
+            inputs = ["x"]
+
+        # Стадии - вызываемые по имени функции, которые не относятся к math и встроенным
+        self.dependencies: List[str] = []
+        for node in ast.walk(tree):
+            if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                    and node.func.id not in DETERMINISTIC_BUILTINS
+                    and node.func.id not in self.dependencies):
+                self.dependencies.append(node.func.id)
+        stages = {dep: f"_stage_{i}" for i, dep in enumerate(self.dependencies)}
+
+        if parameters is None:
+            free_names = []
+            for node in ast.walk(tree):
+                if (isinstance(node, ast.Name) and node.id not in free_names
+                        and node.id not in inputs and node.id not in stages
+                        and node.id != "math" and node.id not in DETERMINISTIC_BUILTINS):
+                    free_names.append(node.id)
+            parameters = [{"name": n, "type": "float", "default": None} for n in free_names]
+
+        body = ast.unparse(_StageRenamer(stages).visit(tree))
+        args = inputs + [f"{p['name']}={p.get('default')!r}" for p in parameters]
+        code = f"def f({', '.join(args)}):\n    return {body}\n"
+
+        if not input_signature:
+            input_signature = {n: "float" for n in inputs}
+            input_signature.update({p["name"]: p.get("type", "float") for p in parameters})
+
+        super().__init__(name=name,
+                         code=code,
+                         description=description,
+                         input_signature=input_signature,
+                         output_signature=output_signature or {"return": "float"},
+                         parameters=parameters)
+
+    def _extract_function(self):
+        """Извлечь объект функции; стадии подставляются в окружение при связывании"""
+        self._globals = {
+            'math': math,
+            '__builtins__': __builtins__
+        }
+        exec(self._compiled_code, self._globals)
+        self._function_obj = self._globals['f']
+
+    def link(self, _chain: Optional[Set[str]] = None):
+        """
+        Связать стадии с текущими версиями хранимых функций
+
+        :raises ValueError: Если стадия не найдена или композиция циклична
+        """
+        chain = set(_chain or ())
+        if self.name in chain:
+            raise ValueError(f"Composition cycle detected at function '{self.name}'")
+        chain.add(self.name)
+
+        stages = []
+        for i, dep_name in enumerate(self.dependencies):
+            dep = self._resolver(dep_name)
+            if dep is None:
+                raise ValueError(f"Function '{self.name}' depends on unknown function '{dep_name}'")
+            if isinstance(dep, ComposedFunction):
+                dep.link(chain)
+            stages.append(dep)
+            self._globals[f"_stage_{i}"] = dep._function_obj
+
+        self._update_capabilities(stages)
+        self._linked = True
+
+    def prepare(self):
+        """Связать стадии, если связывание было сброшено"""
+        if not self._linked:
+            self.link()
+
+    def refresh_capabilities(self):
+        """Пересчитать флаги анализатора; флаги композиции зависят от стадий, поэтому она связывается заново"""
+        try:
+            self.link()
+        except ValueError:
+            # Стадия недоступна: флаги несвязанного кода консервативны (композиция не считается чистой),
+            # связывание повторится при вычислении
+            self.invalidate()
+            super().refresh_capabilities()
+            stage_names = {f"_stage_{i}" for i in range(len(self.dependencies))}
+            referenced = {n for n in self.capabilities["referenced_names"] if n not in stage_names}
+            self.capabilities["referenced_names"] = sorted(referenced | set(self.dependencies))
+
+    def invalidate(self):
+        """Сбросить связывание; следующий вызов compute перечитает стадии"""
+        self._linked = False
+
+    def _update_capabilities(self, stages: List[ParametricFunction]):
+        stage_names = [f"_stage_{i}" for i in range(len(stages))]
+        capabilities = analyze(self.code, input_names=self.input_names, pure_names=stage_names)
+        for flag in self.INHERITED_FLAGS:
+            capabilities[flag] = capabilities[flag] and all(s.capabilities.get(flag) for s in stages)
+        referenced = {n for n in capabilities["referenced_names"] if n not in stage_names}
+        capabilities["referenced_names"] = sorted(referenced | set(self.dependencies))
+        self.capabilities = capabilities
+
+    def get_data(self) -> Dict[str, Any]:
+        """Получить данные функции (сигнатуры, параметры, выражение композиции)"""
+        data = super().get_data()
+        data["expression"] = self.expression
+        data["dependencies"] = list(self.dependencies)
+        return data
+
+    def _evaluate(self,
+                  points: Iterable[Dict[str, float]],
+                  params: Dict[str, float] = None) -> Union[List[float], Dict[str, List[float]]]:
+        """Вычисляет композицию за один проход, без промежуточных списков"""
+        self.prepare()
+        return super()._evaluate(points, params)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Сериализация функции в словарь"""
+        data = super().to_dict()
+        data["expression"] = self.expression
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any],
+                  resolver: Callable[[str], Optional[ParametricFunction]] = None) -> 'ComposedFunction':
+        """Десериализация функции из словаря"""
+        return cls(
+            name=data["name"],
+            expression=data["expression"],
+            resolver=resolver,
+            description=data.get("description", ""),
+            input_signature=data.get("input_signature", {}),
+            output_signature=data.get("output_signature", {}),
+            parameters=data.get("parameters")
+        )
@@ -0,0 +1,404 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+import aiohttp
+
+import Reductions
+from ComposedFunction import ComposedFunction
+from ParametricFunction import broadcast_size
+
+
+class PeerUnavailable(Exception):
+    """Узел не ответил или вернул ошибку сервера; часть можно отдать другому узлу"""
+
+
+class PeerNode:
+    """Узел-исполнитель и статистика его производительности"""
+
+    # Вес нового замера в скользящей оценке производительности
+    EWMA_ALPHA = 0.3
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.shards = 0
+        self.points = 0
+        self.seconds = 0.0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.throughput: Optional[float] = None
+
+    def record_success(self, points: int, seconds: float):
+        self.shards += 1
+        self.points += points
+        self.seconds += seconds
+        self.consecutive_failures = 0
+        rate = points / seconds if seconds > 0 else None
+        if rate is not None:
+            if self.throughput is None:
+                self.throughput = rate
+            else:
+                self.throughput += self.EWMA_ALPHA * (rate - self.throughput)
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.throughput is not None:
+            self.throughput /= 2
+
+    def to_dict(self, healthy: bool) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": healthy,
+            "shards": self.shards,
+            "points": self.points,
+            "seconds": self.seconds,
+            "throughput_pps": self.throughput,
+            "failures": self.failures
+        }
+
+
+class Coordinator:
+    """Распределённое вычисление: разбиение больших заданий на части и рассылка их узлам"""
+
+    def __init__(self,
+                 storage,
+                 peers: List[str] = None,
+                 shard_size: int = 10000,
+                 max_attempts: int = 3,
+                 max_node_failures: int = 3,
+                 timeout: float = 60.0):
+        """
+        :param storage: Локальное хранилище (источник определений функций и резервный исполнитель)
+        :param peers: Адреса узлов, например ["http://127.0.0.1:8001", "http://127.0.0.1:8002"]
+        :param shard_size: Базовый размер части в точках; для быстрых узлов больше, для медленных меньше
+        :param max_attempts: Сколько узлов пробовать для одной части, прежде чем вычислить её локально
+        :param max_node_failures: После стольких ошибок подряд узел исключается из задания
+        :param timeout: Таймаут запроса к узлу в секундах
+        """
+        self.storage = storage
+        self.nodes = [PeerNode(url) for url in peers or []]
+        self.shard_size = shard_size
+        self.max_attempts = max_attempts
+        self.max_node_failures = max_node_failures
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._replicated: Dict[Tuple[str, str], str] = {}
+        self._replication_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.nodes)
+
+    def set_peers(self, peers: List[str]):
+        self.nodes = [PeerNode(url) for url in peers]
+        self._replicated.clear()
+
+    def _healthy(self, node: PeerNode) -> bool:
+        return node.consecutive_failures < self.max_node_failures
+
+    def get_nodes(self) -> List[Dict[str, Any]]:
+        """Статистика производительности узлов"""
+        return [node.to_dict(self._healthy(node)) for node in self.nodes]
+
+    def _node_shard_size(self, node: PeerNode) -> int:
+        """Размер части для узла пропорционально его доле общей производительности"""
+        rates = [n.throughput for n in self.nodes if n.throughput]
+        if node.throughput is None or not rates:
+            return self.shard_size
+        scale = node.throughput / (sum(rates) / len(rates))
+        return max(1, int(self.shard_size * min(4.0, max(0.25, scale))))
+
+    async def _request(self, node: PeerNode, method: str, endpoint: str,
+                       payload: Optional[Dict] = None) -> Tuple[int, Any]:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        try:
+            async with self._session.request(method, f"{node.url}{endpoint}", json=payload) as response:
+                body = await response.json(content_type=None)
+                return response.status, body
+        except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+            raise PeerUnavailable(f"{node.url}: {e}")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _with_dependencies(self, name: str) -> List[Any]:
+        """Функция и все функции, от которых она зависит (зависимости - первыми)"""
+        ordered = []
+        visited = set()
+
+        def visit(func_name: str):
+            if func_name in visited:
+                return
+            visited.add(func_name)
+            func = self.storage.get(func_name)
+            if func is None:
+                raise ValueError(f"Function '{func_name}' not found")
+            if isinstance(func, ComposedFunction):
+                for dep in func.dependencies:
+                    visit(dep)
+            ordered.append(func)
+
+        visit(name)
+        return ordered
+
+    async def _replicate_to(self, node: PeerNode, functions: List[Any]):
+        """Передать узлу определения функций, которые у него устарели или отсутствуют"""
+        for func in functions:
+            data = func.to_dict()
+            signature = json.dumps(data, sort_keys=True, default=str)
+            key = (node.url, func.name)
+
+            # Конкурентные запросы реплицируют одну функцию на узел по очереди
+            lock = self._replication_locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                if self._replicated.get(key) == signature:
+                    continue
+
+                status, body = await self._request(node, "PUT", f"/functions/{func.name}", data)
+                if status == 404:
+                    status, body = await self._request(node, "POST", "/functions", data)
+                    if status == 400 and "already exists" in str(body):
+                        # Функцию успел создать другой координатор - обновляем её до нашей версии
+                        status, body = await self._request(node, "PUT", f"/functions/{func.name}", data)
+                if status != 200:
+                    detail = body.get("detail") if isinstance(body, dict) else body
+                    raise PeerUnavailable(f"{node.url}: could not replicate '{func.name}': {detail}")
+
+                self._replicated[key] = signature
+
+    async def _missing_on(self, node: PeerNode, functions: List[Any]) -> bool:
+        """Нет ли на узле какой-то из функций (например, после его перезапуска)"""
+        for func in functions:
+            status, _ = await self._request(node, "GET", f"/functions/{func.name}")
+            if status == 404:
+                return True
+        return False
+
+    def _forget(self, node: PeerNode):
+        for key in [key for key in self._replicated if key[0] == node.url]:
+            del self._replicated[key]
+
+    async def replicate(self, name: str) -> List[PeerNode]:
+        """Разослать определение функции (с зависимостями) всем узлам; вернуть узлы, получившие его"""
+        functions = self._with_dependencies(name)
+
+        async def replicate_one(node: PeerNode) -> bool:
+            # Исключённый узел проверяем заново: после успешной репликации он возвращается в работу
+            if not self._healthy(node):
+                self._forget(node)
+            try:
+                await self._replicate_to(node, functions)
+                node.consecutive_failures = 0
+                return True
+            except PeerUnavailable:
+                node.record_failure()
+                return False
+
+        nodes = list(self.nodes)
+        done = await asyncio.gather(*(replicate_one(node) for node in nodes))
+        return [node for node, ok in zip(nodes, done) if ok]
+
+    async def _post_shard(self, node: PeerNode, name: str, endpoint: str, payload: Dict) -> Any:
+        status, body = await self._request(node, "POST", endpoint, payload)
+        if status == 404:
+            # 404 означает и ошибку вычисления, и отсутствие функции. Узел мог перезапуститься
+            # и потерять функцию - тогда повторяем после репликации
+            functions = self._with_dependencies(name)
+            if await self._missing_on(node, functions):
+                self._forget(node)
+                await self._replicate_to(node, functions)
+                status, body = await self._request(node, "POST", endpoint, payload)
+
+        if status == 200:
+            return body
+        detail = body.get("detail") if isinstance(body, dict) else body
+        if status in (400, 404):
+            raise ValueError(detail)
+        raise PeerUnavailable(f"{node.url}: HTTP {status}: {detail}")
+
+    async def _run_sharded(self,
+                           name: str,
+                           begin: int,
+                           end: int,
+                           endpoint: str,
+                           make_payload: Callable[[int, int], Dict],
+                           compute_local: Callable[[int, int], Any]) -> List[Any]:
+        """
+        Вычисление диапазона индексов [begin, end) по частям на узлах
+
+        Каждый узел берёт следующую часть, как только освобождается, так что быстрые
+        узлы получают больше работы. Упавшая часть переназначается другому исправному
+        узлу, который её ещё не пробовал; узлы ждут, пока есть части в работе, чтобы
+        подхватить такие повторы. Локально вычисляются только части, которые больше
+        некому отдать.
+
+        :return: Результаты частей в порядке следования
+        """
+        nodes = await self.replicate(name)
+
+        cursor = begin
+        retry = deque()
+        leftover = []
+        results: Dict[int, Any] = {}
+        fatal: List[Exception] = []
+        in_flight = 0
+        changed = asyncio.Condition()
+
+        def next_shard(node: PeerNode):
+            nonlocal cursor
+            for shard in list(retry):
+                if node.url not in shard[3]:
+                    retry.remove(shard)
+                    return shard
+            if cursor < end:
+                lo = cursor
+                cursor = min(end, lo + self._node_shard_size(node))
+                return lo, cursor, 0, set()
+            return None
+
+        def reschedule(lo: int, hi: int, attempts: int, tried: set):
+            """Отдать упавшую часть другому узлу, а если подходящих узлов нет - вычислить локально"""
+            if attempts < self.max_attempts and any(self._healthy(n) and n.url not in tried for n in nodes):
+                retry.append((lo, hi, attempts, tried))
+            else:
+                leftover.append((lo, hi))
+
+        async def worker(node: PeerNode):
+            nonlocal in_flight
+            while True:
+                async with changed:
+                    while True:
+                        if fatal or not self._healthy(node):
+                            return
+                        shard = next_shard(node)
+                        # Пока другие части в работе, любая из них может упасть и достаться этому узлу
+                        if shard is not None or in_flight == 0:
+                            break
+                        await changed.wait()
+                    if shard is None:
+                        return
+                    in_flight += 1
+
+                lo, hi, attempts, tried = shard
+                started = time.perf_counter()
+                try:
+                    results[lo] = await self._post_shard(node, name, endpoint, make_payload(lo, hi))
+                    node.record_success(hi - lo, time.perf_counter() - started)
+                except PeerUnavailable:
+                    node.record_failure()
+                    tried.add(node.url)
+                    reschedule(lo, hi, attempts + 1, tried)
+                except ValueError as e:
+                    fatal.append(e)
+                finally:
+                    async with changed:
+                        in_flight -= 1
+                        changed.notify_all()
+
+        await asyncio.gather(*(worker(node) for node in nodes))
+        if fatal:
+            raise fatal[0]
+
+        # Части, которые не удалось (или некому) отдать узлам, считаем локально вне цикла событий
+        leftover.extend((lo, hi) for lo, hi, _, _ in retry)
+        if cursor < end:
+            leftover.append((cursor, end))
+        for lo, hi in leftover:
+            results[lo] = await asyncio.to_thread(compute_local, lo, hi)
+
+        return [results[lo] for lo in sorted(results)]
+
+    @staticmethod
+    def _concat(parts: List[Any]) -> Any:
+        """Склейка результатов частей: списков значений или столбцов"""
+        if parts and isinstance(parts[0], dict):
+            return {key: [v for part in parts for v in part[key]] for key in parts[0]}
+        return [v for part in parts for v in part]
+
+    async def compute(self, name: str, x: List[float], params: Dict[str, float] = None) -> Any:
+        """Распределённое вычисление функции для списка x"""
+        endpoint = f"/functions/{name}/compute"
+        parts = await self._run_sharded(
+            name, 0, len(x), endpoint,
+            lambda lo, hi: {"x": x[lo:hi], "params": params or {}},
+            lambda lo, hi: self.storage.compute(name, x[lo:hi], params)
+        )
+        return self._concat(parts)
+
+    async def compute_points(self, name: str, inputs: Dict[str, List[float]], params: Dict[str, float] = None) -> Any:
+        """Распределённое вычисление в точках; списки длины 1 передаются каждой части целиком"""
+        total = broadcast_size(inputs)
+
+        def part(lo: int, hi: int) -> Dict[str, Any]:
+            return {k: v[lo:hi] if isinstance(v, list) and len(v) == total else v for k, v in inputs.items()}
+
+        endpoint = f"/functions/{name}/compute"
+        parts = await self._run_sharded(
+            name, 0, total, endpoint,
+            lambda lo, hi: {"points": part(lo, hi), "params": params or {}},
+            lambda lo, hi: self.storage.compute_points(name, part(lo, hi), params)
+        )
+        return self._concat(parts)
+
+    async def compute_grid(self, name: str, axes: Dict[str, List[float]], params: Dict[str, float] = None) -> Any:
+        """Распределённое вычисление на сетке; сетка делится по первой оси"""
+        func = self.storage.get(name)
+        if func is None:
+            raise ValueError(f"Function '{name}' not found")
+        names = func.input_names
+        first = names[0]
+        if not isinstance(axes.get(first), list):
+            raise ValueError(f"Grid axis '{first}' must be a list")
+
+        def part(lo: int, hi: int) -> Dict[str, Any]:
+            return dict(axes, **{first: axes[first][lo:hi]})
+
+        endpoint = f"/functions/{name}/compute"
+        parts = await self._run_sharded(
+            name, 0, len(axes[first]), endpoint,
+            lambda lo, hi: {"grid": part(lo, hi), "params": params or {}},
+            lambda lo, hi: self.storage.compute_grid(name, part(lo, hi), params)
+        )
+        # Построчный порядок: части по первой оси склеиваются подряд
+        return {
+            "axes": names,
+            "shape": [len(axes[n]) if isinstance(axes.get(n), list) else 1 for n in names],
+            "values": self._concat([p["values"] for p in parts])
+        }
+
+    async def reduce(self,
+                     name: str,
+                     x: Any,
+                     params: Dict[str, float] = None,
+                     reductions: List[Any] = None,
+                     chunk_size: int = Reductions.DEFAULT_CHUNK_SIZE,
+                     output: str = None) -> Dict[str, Any]:
+        """Распределённая свёртка: части области сворачиваются на узлах, результаты объединяются"""
+        Reductions.make_accumulators(reductions)
+        begin, end = Reductions.domain_bounds(x)
+
+        def payload(lo: int, hi: int) -> Dict[str, Any]:
+            return {
+                "x": Reductions.domain_slice(x, lo, hi),
+                "params": params or {},
+                "reductions": reductions,
+                "chunk_size": chunk_size,
+                "output": output
+            }
+
+        endpoint = f"/functions/{name}/reduce"
+        parts = await self._run_sharded(
+            name, begin, end, endpoint, payload,
+            lambda lo, hi: self.storage.reduce(name, Reductions.domain_slice(x, lo, hi), params,
+                                               reductions, chunk_size, output)
+        )
+        if not parts:
+            return await asyncio.to_thread(self.storage.reduce, name, Reductions.domain_slice(x, begin, end),
+                                           params, reductions, chunk_size, output)
+        return Reductions.merge_results(reductions, parts)
@@ -0,0 +1,236 @@
+import ast
+from typing import Dict, List, Any, Iterable, Optional, Set
+
+
+# Встроенные функции, допустимые в "чисто математическом" коде
+MATH_BUILTINS = {"abs", "min", "max", "pow", "round", "float", "int", "sum", "divmod", "bool"}
+
+# Встроенные функции без побочных эффектов и с детерминированным результатом
+DETERMINISTIC_BUILTINS = MATH_BUILTINS | {
+    "len", "range", "enumerate", "zip", "map", "filter", "sorted", "reversed",
+    "list", "tuple", "dict", "set", "frozenset", "str", "complex",
+    "all", "any", "isinstance", "ValueError", "ZeroDivisionError", "ArithmeticError",
+    "True", "False", "None"
+}
+
+# Узлы, которые влекут побочные эффекты или зависят от внешнего состояния
+SIDE_EFFECT_NODES = (ast.Global, ast.Nonlocal, ast.Import, ast.ImportFrom,
+                     ast.Yield, ast.YieldFrom, ast.Await, ast.Delete)
+
+BRANCH_NODES = (ast.If, ast.IfExp, ast.While, ast.BoolOp, ast.Try, ast.Match, ast.Assert)
+
+LOOP_NODES = (ast.For, ast.AsyncFor, ast.While,
+              ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+# Значения по умолчанию, создающие общий для всех вызовов изменяемый объект
+MUTABLE_DEFAULT_NODES = (ast.List, ast.Dict, ast.Set, ast.ListComp, ast.DictComp, ast.SetComp, ast.Call)
+
+
+def _root_name(node: ast.AST) -> Optional[str]:
+    """Имя объекта, к которому относится цепочка обращений a.b[c].d"""
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+class _FunctionScope(ast.NodeVisitor):
+    """Локальные имена функции, имена, на которые она ссылается, и изменения внешних объектов"""
+
+    def __init__(self, node: ast.FunctionDef):
+        self.local: Set[str] = set()
+        self.loaded: Set[str] = set()
+        self.math_attrs: Set[str] = set()
+        self.calls: Set[str] = set()
+        self.stores: List[ast.AST] = []
+        self.method_calls: List[ast.Attribute] = []
+        self._add_args(node.args)
+        for stmt in node.body:
+            self.visit(stmt)
+
+    def _add_args(self, args: ast.arguments):
+        for arg in args.posonlyargs + args.args + args.kwonlyargs:
+            self.local.add(arg.arg)
+        if args.vararg:
+            self.local.add(args.vararg.arg)
+        if args.kwarg:
+            self.local.add(args.kwarg.arg)
+
+    def visit_FunctionDef(self, node):
+        self.local.add(node.name)
+        self._add_args(node.args)
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        self._add_args(node.args)
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.loaded.add(node.id)
+        else:
+            self.local.add(node.id)
+
+    def visit_Attribute(self, node):
+        if isinstance(node.value, ast.Name) and node.value.id == "math":
+            self.math_attrs.add(node.attr)
+        if not isinstance(node.ctx, ast.Load):
+            self.stores.append(node)
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        if not isinstance(node.ctx, ast.Load):
+            self.stores.append(node)
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name):
+            self.calls.add(node.func.id)
+        elif isinstance(node.func, ast.Attribute):
+            self.method_calls.append(node.func)
+        self.generic_visit(node)
+
+    def mutates_outer_state(self) -> bool:
+        """Изменяет ли функция объекты, не созданные в ней самой"""
+        for target in self.stores:
+            if _root_name(target) not in self.local:
+                return True
+        for method in self.method_calls:
+            root = _root_name(method.value)
+            if root != "math" and root not in self.local:
+                return True
+        return False
+
+
+def _find_function(tree: ast.Module) -> Optional[ast.FunctionDef]:
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == "f":
+            return node
+    return None
+
+
+def _has_mutable_defaults(node: ast.FunctionDef) -> bool:
+    defaults = node.args.defaults + [d for d in node.args.kw_defaults if d is not None]
+    return any(isinstance(d, MUTABLE_DEFAULT_NODES) for d in defaults)
+
+
+def _has_module_state(tree: ast.Module) -> bool:
+    """Есть ли в модуле что-то, кроме определений функций (и строки документации)"""
+    for stmt in tree.body:
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant):
+            continue
+        return True
+    return False
+
+
+def _reachable(defs: Dict[str, ast.FunctionDef], scopes: Dict[str, _FunctionScope], start: str) -> List[str]:
+    """Функции модуля, вызываемые (прямо или косвенно) из start"""
+    order = []
+    pending = [start]
+    while pending:
+        name = pending.pop()
+        if name in order:
+            continue
+        order.append(name)
+        pending.extend(callee for callee in scopes[name].calls if callee in defs)
+    return order
+
+
+def _has_call_cycle(defs: Dict[str, ast.FunctionDef], scopes: Dict[str, _FunctionScope], names: List[str]) -> bool:
+    """Есть ли рекурсия (цикл в графе вызовов) среди указанных функций"""
+    state: Dict[str, int] = {}
+
+    def visit(name: str) -> bool:
+        state[name] = 1
+        for callee in scopes[name].calls:
+            if callee not in defs:
+                continue
+            if state.get(callee) == 1 or (callee not in state and visit(callee)):
+                return True
+        state[name] = 2
+        return False
+
+    return any(name not in state and visit(name) for name in names)
+
+
+def _branches_on(node: ast.AST, names: Set[str]) -> bool:
+    """Есть ли в коде ветвление, условие которого зависит от указанных имён"""
+    for sub in ast.walk(node):
+        if isinstance(sub, (ast.If, ast.IfExp, ast.While)):
+            test = sub.test
+        elif isinstance(sub, ast.BoolOp):
+            test = sub
+        else:
+            continue
+        if any(isinstance(n, ast.Name) and n.id in names for n in ast.walk(test)):
+            return True
+    return False
+
+
+def analyze(code: str,
+            input_names: Iterable[str] = ("x",),
+            pure_names: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Статический анализ кода функции
+
+    Анализируются f и все функции модуля, которые она вызывает. Состояние на уровне
+    модуля, изменяемые значения по умолчанию и изменение внешних объектов
+    считаются побочными эффектами.
+
+    :param code: Код функции, определяющий функцию f
+    :type code: str
+    :param input_names: Имена входных переменных (для определения ветвления по входу)
+    :param pure_names: Дополнительные глобальные имена, вызов которых заведомо чист
+    :return: Флаги возможностей функции
+    :rtype: Dict[str, Any]
+    """
+    tree = ast.parse(code)
+
+    defs = {node.name: node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    scopes = {name: _FunctionScope(node) for name, node in defs.items()}
+
+    func_node = _find_function(tree)
+    names = _reachable(defs, scopes, "f") if func_node is not None else list(defs)
+    nodes = [defs[name] for name in names]
+
+    pure_names = set(pure_names)
+    referenced: Set[str] = set()
+    math_attrs: Set[str] = set()
+    for name in names:
+        scope = scopes[name]
+        referenced |= scope.loaded - scope.local
+        math_attrs |= scope.math_attrs
+    referenced -= set(defs)
+    external = referenced - pure_names
+
+    uses_only_math = external <= MATH_BUILTINS | {"math"}
+    deterministic = external <= DETERMINISTIC_BUILTINS | {"math"}
+    has_side_effects = (
+        _has_module_state(tree)
+        or any(isinstance(node, SIDE_EFFECT_NODES) for node in ast.walk(tree))
+        or any(_has_mutable_defaults(node) for node in nodes)
+        or any(scopes[name].mutates_outer_state() for name in names)
+    )
+
+    walked = [sub for node in nodes for sub in ast.walk(node)]
+    recursive = _has_call_cycle(defs, scopes, names)
+    branch_free = not any(isinstance(node, BRANCH_NODES) for node in walked)
+    loop_free = not recursive and not any(isinstance(node, LOOP_NODES) for node in walked)
+
+    pure = deterministic and not has_side_effects
+
+    return {
+        "pure": pure,
+        "deterministic": deterministic,
+        "uses_only_math": uses_only_math,
+        "branch_free": branch_free,
+        "branches_on_input": _branches_on(func_node or tree, set(input_names)),
+        "loop_free": loop_free,
+        "cacheable": pure,
+        "vectorizable": pure and uses_only_math and branch_free and loop_free,
+        "referenced_names": sorted(referenced | {f"math.{attr}" for attr in math_attrs})
+    }
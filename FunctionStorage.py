@@ -1,7 +1,9 @@
 import json
 import os
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union
 from ParametricFunction import ParametricFunction
+from ComposedFunction import ComposedFunction
+import Reductions
 
 
 class FunctionStorage:
@@ -26,16 +28,46 @@ class FunctionStorage:
                 loaded_count = 0
                 for func_data in data.get("functions", []):
                     try:
-                        func = ParametricFunction.from_dict(func_data)
+                        func = self._from_dict(func_data)
                         self._functions[func.name] = func
                         loaded_count += 1
                     except Exception as e:
                         print(f"Could not load function {func_data.get('name', 'unknown')}: {e}")
                 
+                # Композиции связываются, когда загружены все стадии: до этого их флаги
+                # описывают сгенерированный код с _stage_N, а не сами стадии
+                for func in self._functions.values():
+                    if isinstance(func, ComposedFunction):
+                        func.refresh_capabilities()
+                
                 print(f"Loaded {loaded_count} functions from {self._storage_file}")
             except Exception as e:
                 print(f"Error loading functions: {e}")
     
+    def _from_dict(self, data: Dict[str, Any]) -> ParametricFunction:
+        """Восстановление функции из словаря с учётом композиций"""
+        if data.get("expression"):
+            return ComposedFunction.from_dict(data, resolver=self.get)
+        return ParametricFunction.from_dict(data)
+    
+    def _dependents(self, name: str) -> List[ComposedFunction]:
+        """Композиции, прямо или транзитивно зависящие от функции"""
+        result = []
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            for func in self._functions.values():
+                if (isinstance(func, ComposedFunction) and current in func.dependencies
+                        and func not in result):
+                    result.append(func)
+                    pending.append(func.name)
+        return result
+    
+    def _invalidate_dependents(self, name: str):
+        """Перепривязка композиций после изменения или удаления функции (их флаги зависят от стадий)"""
+        for func in self._dependents(name):
+            func.refresh_capabilities()
+    
     def _save(self):
         """Сохранение функций в файл"""
         try:
@@ -54,7 +86,12 @@ class FunctionStorage:
         if func.name in self._functions:
             raise ValueError(f"Function '{func.name}' already exists")
         
+        if isinstance(func, ComposedFunction):
+            func.link()
+        
         self._functions[func.name] = func
+        # Композиции, ждавшие удалённую стадию с этим именем, связываются с новой
+        self._invalidate_dependents(func.name)
         self._save()
         return func
     
@@ -68,7 +105,8 @@ class FunctionStorage:
                description: str = None,
                input_signature: Optional[Dict[str, str]] = None,
                output_signature: Optional[Dict[str, str]] = None,
-               parameters: Optional[List[Dict[str, Any]]] = None) -> Optional[ParametricFunction]:
+               parameters: Optional[List[Dict[str, Any]]] = None,
+               expression: str = None) -> Optional[ParametricFunction]:
         """Обновление функции"""
         func = self._functions.get(name)
         if not func:
@@ -76,7 +114,24 @@ class FunctionStorage:
         
         updated = False
         
-        if code is not None:
+        if expression is not None:
+            try:
+                new_func = ComposedFunction(
+                    name=name,
+                    expression=expression,
+                    resolver=self.get,
+                    description=description or func.description,
+                    input_signature=input_signature,
+                    output_signature=output_signature,
+                    parameters=parameters
+                )
+                self._functions[name] = new_func
+                new_func.link()
+                updated = True
+            except Exception as e:
+                self._functions[name] = func
+                raise ValueError(f"Invalid composition: {e}")
+        elif code is not None:
             try:
                 new_func = ParametricFunction(
                     name=name, 
@@ -106,8 +161,12 @@ class FunctionStorage:
             if parameters is not None:
                 func.parameters = parameters
                 updated = True
+            
+            if input_signature is not None or parameters is not None:
+                func.refresh_capabilities()
         
         if updated:
+            self._invalidate_dependents(name)
             self._save()
         
         return self._functions.get(name)
@@ -116,6 +175,7 @@ class FunctionStorage:
         """Удаление функции"""
         if name in self._functions:
             del self._functions[name]
+            self._invalidate_dependents(name)
             self._save()
             return True
         return False
@@ -124,14 +184,54 @@ class FunctionStorage:
         """Список всех функций"""
         return list(self._functions.values())
     
-    def compute(self, name: str, x: List[float], params: Dict[str, float] = None) -> List[float]:
+    def compute(self, name: str, x: List[float], params: Dict[str, float] = None) -> Union[List[float], Dict[str, List[float]]]:
         """Вычисление функции"""
         func = self.get(name)
         if not func:
             raise ValueError(f"Function '{name}' not found")
         
         return func.compute(x, params)
+    
+    def compute_points(self, name: str, inputs: Dict[str, List[float]], params: Dict[str, float] = None) -> Union[List[float], Dict[str, List[float]]]:
+        """Вычисление функции нескольких переменных в заданных точках"""
+        func = self.get(name)
+        if not func:
+            raise ValueError(f"Function '{name}' not found")
+        
+        return func.compute_points(inputs, params)
+    
+    def compute_grid(self, name: str, axes: Dict[str, List[float]], params: Dict[str, float] = None) -> Dict[str, Any]:
+        """Вычисление функции нескольких переменных на декартовой сетке"""
+        func = self.get(name)
+        if not func:
+            raise ValueError(f"Function '{name}' not found")
+        
+        return func.compute_grid(axes, params)
+    
+    def reduce(self,
+               name: str,
+               x: Any,
+               params: Dict[str, float] = None,
+               reductions: List[Any] = None,
+               chunk_size: int = Reductions.DEFAULT_CHUNK_SIZE,
+               output: str = None) -> Dict[str, Any]:
+        """Потоковая свёртка значений функции"""
+        func = self.get(name)
+        if not func:
+            raise ValueError(f"Function '{name}' not found")
+        
+        return Reductions.reduce(func, x, params, reductions, chunk_size, output)
+
+
+# Глобальное хранилище создаётся при первом обращении к FunctionStorage.storage,
+# чтобы импорт классов модуля не читал functions.json
+_storage: Optional[FunctionStorage] = None
 
 
-# Глобальное хранилище
-storage = FunctionStorage()
\ No newline at end of file
+def __getattr__(name: str) -> Any:
+    global _storage
+    if name == "storage":
+        if _storage is None:
+            _storage = FunctionStorage()
+        return _storage
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -1,15 +1,64 @@
-from fastapi import FastAPI, HTTPException
-from typing import List, Dict, Optional, Any
+from fastapi import FastAPI, HTTPException, Request, Response
+from typing import List, Dict, Optional, Any, Tuple
 import uvicorn
-from FunctionStorage import storage, ParametricFunction
+import argparse
+import asyncio
+from FunctionStorage import storage, ParametricFunction, ComposedFunction
+from MicroBatcher import MicroBatcher
+from Coordinator import Coordinator
+from ResponseEncoding import encode_json, encode_binary, JSON_MEDIA_TYPE, BINARY_MEDIA_TYPE, FLOAT32_PRECISION
 from dataclasses import dataclass
+from contextlib import asynccontextmanager
+import json
+import math
+import Reductions
+from Tracing import Tracer, current_trace
 
-app = FastAPI(title="Parametric Function Server")
+# Пакетирование мелких запросов вычисления
+batcher = MicroBatcher(storage)
+
+# Распределённое вычисление (включается списком узлов --peers)
+coordinator = Coordinator(storage)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await coordinator.close()
+
+
+app = FastAPI(title="Parametric Function Server", lifespan=lifespan)
+
+
+# Трассировка фаз запросов и журнал медленных запросов
+tracer = Tracer()
+
+
+def wants_server_timing(request: Request) -> bool:
+    """Клиент запросил разбивку по фазам (заголовок X-Server-Timing или ?timing=1)"""
+    flag = request.headers.get("x-server-timing") or request.query_params.get("timing")
+    return flag is not None and flag.lower() not in ("0", "false", "no")
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    trace = tracer.start(request.method, request.url.path)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        tracer.finish(trace, status)
+    
+    if wants_server_timing(request):
+        response.headers["Server-Timing"] = trace.server_timing()
+    return response
 
 @dataclass
 class FunctionCreateRequest:
     name: str
-    code: str
+    code: Optional[str] = None
+    expression: Optional[str] = None
     description: str = ""
     input_signature: Optional[Dict[str, str]] = None
     output_signature: Optional[Dict[str, str]] = None
@@ -18,6 +67,7 @@ class FunctionCreateRequest:
 @dataclass
 class FunctionUpdateRequest:
     code: Optional[str] = None
+    expression: Optional[str] = None
     description: Optional[str] = None
     input_signature: Optional[Dict[str, str]] = None
     output_signature: Optional[Dict[str, str]] = None
@@ -25,8 +75,22 @@ class FunctionUpdateRequest:
 
 @dataclass
 class ComputeRequest:
-    x: List[float]
+    x: Optional[List[float]] = None
+    params: Dict[str, float] = None
+    points: Optional[Dict[str, List[float]]] = None
+    grid: Optional[Dict[str, List[float]]] = None
+    format: str = "json"
+    precision: Optional[int] = None
+    float32: bool = False
+
+
+@dataclass
+class ReduceRequest:
+    x: Any
+    reductions: List[Any]
     params: Dict[str, float] = None
+    chunk_size: int = 65536
+    output: Optional[str] = None
 
 
 @dataclass
@@ -43,8 +107,8 @@ def validate_function_data(data: Dict) -> Dict:
     """Валидация данных функции"""
     if 'name' not in data:
         raise HTTPException(status_code=400, detail="Field 'name' is required")
-    if 'code' not in data:
-        raise HTTPException(status_code=400, detail="Field 'code' is required")
+    if 'code' not in data and 'expression' not in data:
+        raise HTTPException(status_code=400, detail="Field 'code' or 'expression' is required")
     return data
 
 
@@ -82,14 +146,25 @@ async def create_function(request_data: Dict[str, Any]):
     try:
         data = validate_function_data(request_data)
         
-        func = ParametricFunction(
-            name=data["name"],
-            code=data["code"],
-            description=data.get("description", ""),
-            input_signature=data.get("input_signature"),
-            output_signature=data.get("output_signature"),
-            parameters=data.get("parameters")
-        )
+        if data.get("expression"):
+            func = ComposedFunction(
+                name=data["name"],
+                expression=data["expression"],
+                resolver=storage.get,
+                description=data.get("description", ""),
+                input_signature=data.get("input_signature"),
+                output_signature=data.get("output_signature"),
+                parameters=data.get("parameters")
+            )
+        else:
+            func = ParametricFunction(
+                name=data["name"],
+                code=data["code"],
+                description=data.get("description", ""),
+                input_signature=data.get("input_signature"),
+                output_signature=data.get("output_signature"),
+                parameters=data.get("parameters")
+            )
         
         storage.create(func)
         return {"message": f"Function '{data['name']}' created successfully"}
@@ -108,13 +183,16 @@ async def update_function(name: str, request_data: Dict[str, Any]):
             description=request_data.get("description"),
             input_signature=request_data.get("input_signature"),
             output_signature=request_data.get("output_signature"),
-            parameters=request_data.get("parameters")
+            parameters=request_data.get("parameters"),
+            expression=request_data.get("expression")
         )
         
         if not updated:
             raise HTTPException(status_code=404, detail=f"Function '{name}' not found")
         
         return {"message": f"Function '{name}' updated successfully"}
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -129,25 +207,220 @@ async def delete_function(name: str):
 
     return {"message": f"Function '{name}' deleted successfully"}
 
+def response_options(request: Request, request_data: Dict[str, Any]) -> Tuple[str, bool, Optional[int]]:
+    """Проверка параметров ответа (формат, float32, точность) до вычисления"""
+    output_format = request_data.get('format')
+    if output_format is None:
+        accept = request.headers.get("accept", "")
+        output_format = "binary" if BINARY_MEDIA_TYPE in accept else "json"
+    if output_format not in ("json", "binary"):
+        raise HTTPException(status_code=400, detail="Field 'format' must be 'json' or 'binary'")
+    
+    float32 = bool(request_data.get('float32', False))
+    
+    precision = request_data.get('precision')
+    if precision is None and float32:
+        precision = FLOAT32_PRECISION
+    # bool - подкласс int, но True/False точностью не являются
+    if precision is not None and (isinstance(precision, bool) or not isinstance(precision, int)
+                                  or not 1 <= precision <= 17):
+        raise HTTPException(status_code=400, detail="Field 'precision' must be an integer from 1 to 17")
+    
+    return output_format, float32, precision
+
+
+def compute_response(result: Any, options: Tuple[str, bool, Optional[int]]) -> Response:
+    """Сериализация результата вычисления напрямую в байты (JSON или плотный массив чисел)"""
+    output_format, float32, precision = options
+    
+    if output_format == "binary":
+        body, headers = encode_binary(result, float32)
+        return Response(content=body, media_type=BINARY_MEDIA_TYPE, headers=headers)
+    
+    return Response(content=encode_json(result, precision), media_type=JSON_MEDIA_TYPE)
+
+
+def count_points(request_data: Dict[str, Any]) -> Optional[int]:
+    """Число точек в запросе вычисления (для журнала медленных запросов)"""
+    if isinstance(request_data.get('points'), dict):
+        return max((len(v) for v in request_data['points'].values() if isinstance(v, list)), default=1)
+    if isinstance(request_data.get('grid'), dict):
+        return math.prod(len(v) if isinstance(v, list) else 1 for v in request_data['grid'].values())
+    if isinstance(request_data.get('x'), list):
+        return len(request_data['x'])
+    return None
+
+
+def count_domain(request_data: Dict[str, Any]) -> Optional[int]:
+    """Число точек области свёртки (для журнала медленных запросов)"""
+    try:
+        return Reductions.domain_size(request_data['x'])
+    except (ValueError, TypeError):
+        return None
+
+
 @app.post("/functions/{name}/compute")
-async def compute_function(name: str, request_data: Dict[str, Any]):
+async def compute_function(name: str, request: Request):
     """Вычислить функцию для заданных значений"""
-    try:
-        if 'x' not in request_data:
-            raise HTTPException(status_code=400, detail="Field 'x' is required")
+    trace = current_trace()
+    
+    with trace.phase("read"):
+        body = await request.body()
+    
+    with trace.phase("parse"):
+        try:
+            request_data = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body must be valid JSON")
+        if not isinstance(request_data, dict):
+            raise HTTPException(status_code=400, detail="Request body must be a JSON object")
         
-        x = request_data['x']
         params = request_data.get('params', {})
         
-        if not isinstance(x, list):
+        if 'points' in request_data:
+            if not isinstance(request_data['points'], dict):
+                raise HTTPException(status_code=400, detail="Field 'points' must be an object of input lists")
+        elif 'grid' in request_data:
+            if not isinstance(request_data['grid'], dict):
+                raise HTTPException(status_code=400, detail="Field 'grid' must be an object of axis lists")
+        elif 'x' not in request_data:
+            raise HTTPException(status_code=400, detail="Field 'x', 'points' or 'grid' is required")
+        elif not isinstance(request_data['x'], list):
             raise HTTPException(status_code=400, detail="Field 'x' must be a list")
         
-        results = storage.compute(name, x, params)
-        return results
+        options = response_options(request, request_data)
+    
+    trace.annotate(function=name, x_len=count_points(request_data), params=params)
+    
+    try:
+        with trace.phase("lookup"):
+            func = storage.get(name)
+            if not func:
+                raise ValueError(f"Function '{name}' not found")
+        
+        with trace.phase("compile"):
+            func.prepare()
+        
+        with trace.phase("evaluate"):
+            if 'points' in request_data:
+                results = storage.compute_points(name, request_data['points'], params)
+            elif 'grid' in request_data:
+                results = storage.compute_grid(name, request_data['grid'], params)
+            else:
+                results = await batcher.compute(name, request_data['x'], params)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error computing function: {str(e)}")
+    
+    with trace.phase("serialize"):
+        return compute_response(results, options)
+
+
+@app.post("/functions/{name}/reduce")
+async def reduce_function(name: str, request_data: Dict[str, Any]):
+    """Свернуть значения функции на области без передачи всего вектора"""
+    if 'x' not in request_data:
+        raise HTTPException(status_code=400, detail="Field 'x' is required")
+    if 'reductions' not in request_data:
+        raise HTTPException(status_code=400, detail="Field 'reductions' is required")
+    trace = current_trace()
+    trace.annotate(function=name, x_len=count_domain(request_data), params=request_data.get('params', {}))
+    
+    with trace.phase("lookup"):
+        if not storage.get(name):
+            raise HTTPException(status_code=404, detail=f"Function '{name}' not found")
+    
+    try:
+        # Свёртка по большой области занимает секунды - выполняем её вне цикла событий
+        with trace.phase("evaluate"):
+            result = await asyncio.to_thread(
+                storage.reduce,
+                name,
+                request_data['x'],
+                request_data.get('params', {}),
+                request_data['reductions'],
+                int(request_data.get('chunk_size', 65536)),
+                request_data.get('output')
+            )
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Error reducing function: {str(e)}")
+    
+    # Кодируем явно, как compute, чтобы сериализация попала в замеры фаз
+    with trace.phase("serialize"):
+        return Response(content=encode_json(result), media_type=JSON_MEDIA_TYPE)
+
+
+def require_coordinator(name: str):
+    if not coordinator.enabled:
+        raise HTTPException(status_code=400, detail="Coordinator mode is disabled, start the server with --peers")
+    if not storage.get(name):
+        raise HTTPException(status_code=404, detail=f"Function '{name}' not found")
+
+
+@app.post("/cluster/functions/{name}/compute")
+async def cluster_compute_function(name: str, request_data: Dict[str, Any], request: Request):
+    """Вычислить функцию, распределив точки между узлами"""
+    params = request_data.get('params', {})
+    options = response_options(request, request_data)
+    
+    trace = current_trace()
+    trace.annotate(function=name, x_len=count_points(request_data), params=params)
+    
+    with trace.phase("lookup"):
+        require_coordinator(name)
+    
+    try:
+        with trace.phase("evaluate"):
+            if isinstance(request_data.get('points'), dict):
+                results = await coordinator.compute_points(name, request_data['points'], params)
+            elif isinstance(request_data.get('grid'), dict):
+                results = await coordinator.compute_grid(name, request_data['grid'], params)
+            elif isinstance(request_data.get('x'), list):
+                results = await coordinator.compute(name, request_data['x'], params)
+            else:
+                raise ValueError("Field 'x' (list), 'points' or 'grid' (object) is required")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error computing function: {str(e)}")
+    
+    with trace.phase("serialize"):
+        return compute_response(results, options)
+
+
+@app.post("/cluster/functions/{name}/reduce")
+async def cluster_reduce_function(name: str, request_data: Dict[str, Any]):
+    """Свернуть значения функции, распределив область между узлами"""
+    if 'x' not in request_data:
+        raise HTTPException(status_code=400, detail="Field 'x' is required")
+    if 'reductions' not in request_data:
+        raise HTTPException(status_code=400, detail="Field 'reductions' is required")
+    trace = current_trace()
+    trace.annotate(function=name, x_len=count_domain(request_data), params=request_data.get('params', {}))
+    
+    with trace.phase("lookup"):
+        require_coordinator(name)
+    
+    try:
+        with trace.phase("evaluate"):
+            result = await coordinator.reduce(
+                name,
+                request_data['x'],
+                request_data.get('params', {}),
+                request_data['reductions'],
+                int(request_data.get('chunk_size', 65536)),
+                request_data.get('output')
+            )
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Error reducing function: {str(e)}")
+    
+    with trace.phase("serialize"):
+        return Response(content=encode_json(result), media_type=JSON_MEDIA_TYPE)
+
+
+@app.get("/cluster/nodes")
+async def get_cluster_nodes():
+    """Получить производительность узлов"""
+    return coordinator.get_nodes()
 
 
 @app.get("/functions/{name}/data")
@@ -160,5 +433,45 @@ async def get_function_metadata(name: str):
     return func.get_data()
 
 
+@app.get("/metrics/batching")
+async def get_batching_metrics():
+    """Получить статистику пакетирования запросов вычисления"""
+    return batcher.get_metrics()
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Parametric Function Server")
+    parser.add_argument("--host", default="0.0.0.0", help="Host to bind")
+    parser.add_argument("--port", type=int, default=8000, help="Port to bind")
+    parser.add_argument("--batch-window-ms", type=float, default=batcher.window_ms,
+                        help="Micro-batching window in milliseconds (0 disables batching)")
+    parser.add_argument("--batch-max-points", type=int, default=batcher.max_points,
+                        help="Flush a batch as soon as it holds this many points")
+    parser.add_argument("--batch-max-request-points", type=int, default=batcher.max_request_points,
+                        help="Requests with more points bypass batching")
+    parser.add_argument("--peers", nargs="*", default=[],
+                        help="Peer server URLs; enables coordinator endpoints under /cluster")
+    parser.add_argument("--shard-size", type=int, default=coordinator.shard_size,
+                        help="Base shard size in points for coordinator mode")
+    parser.add_argument("--slow-ms", type=float, default=tracer.slow_ms,
+                        help="Log requests slower than this many milliseconds (negative disables the log)")
+    parser.add_argument("--slow-log", default=tracer.log_path, help="Slow request log file (JSON lines)")
+    parser.add_argument("--slow-log-max-bytes", type=int, default=tracer.max_bytes,
+                        help="Rotate the slow request log after this many bytes")
+    parser.add_argument("--slow-log-backups", type=int, default=tracer.backup_count,
+                        help="Number of rotated slow request logs to keep")
+    args = parser.parse_args()
+
+    batcher.window_ms = args.batch_window_ms
+    batcher.max_points = args.batch_max_points
+    batcher.max_request_points = args.batch_max_request_points
+    
+    coordinator.set_peers(args.peers)
+    coordinator.shard_size = args.shard_size
+    
+    tracer.slow_ms = args.slow_ms
+    tracer.log_path = args.slow_log
+    tracer.max_bytes = args.slow_log_max_bytes
+    tracer.backup_count = args.slow_log_backups
+
+    uvicorn.run(app, host=args.host, port=args.port)
\ No newline at end of file
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import time
+from typing import Dict, List, Any, Tuple, Union
+
+
+class _PendingBatch:
+    """Накапливаемый пакет запросов для одной функции и одного набора параметров"""
+
+    def __init__(self, name: str, params: Dict[str, float]):
+        self.name = name
+        self.params = params
+        self.items: List[Tuple[List[float], asyncio.Future, float]] = []
+        self.points = 0
+        self.timer: asyncio.TimerHandle = None
+
+
+class MicroBatcher:
+    """Объединение мелких конкурентных запросов вычисления в один пакет"""
+
+    # Верхние границы корзин гистограммы размеров пакета (в запросах)
+    SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+    def __init__(self,
+                 storage,
+                 window_ms: float = 1.0,
+                 max_points: int = 256,
+                 max_request_points: int = 16):
+        """
+        :param storage: Хранилище функций, через которое выполняется вычисление
+        :param window_ms: Сколько ждать попутных запросов после первого в пакете (0 - без пакетирования)
+        :type window_ms: float
+        :param max_points: Пакет отправляется сразу, как только набрано столько точек
+        :type max_points: int
+        :param max_request_points: Запросы длиннее этого вычисляются сразу, без ожидания
+        :type max_request_points: int
+        """
+        self.storage = storage
+        self.window_ms = window_ms
+        self.max_points = max_points
+        self.max_request_points = max_request_points
+        self._pending: Dict[Tuple[str, str], _PendingBatch] = {}
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self._batches = 0
+        self._requests = 0
+        self._points = 0
+        self._size_histogram = {bound: 0 for bound in self.SIZE_BUCKETS}
+        self._size_overflow = 0
+        self._max_batch_requests = 0
+        self._delay_total = 0.0
+        self._delay_max = 0.0
+
+    @staticmethod
+    def _key(name: str, params: Dict[str, float]) -> Tuple[str, str]:
+        return name, json.dumps(params, sort_keys=True, default=str)
+
+    async def compute(self, name: str, x: List[float],
+                      params: Dict[str, float] = None) -> Union[List[float], Dict[str, List[float]]]:
+        """Вычисление функции, возможно в составе общего пакета"""
+        if params is None:
+            params = {}
+
+        if self.window_ms <= 0 or len(x) > self.max_request_points:
+            return self.storage.compute(name, x, params)
+
+        # Функции с побочными эффектами не пакетируем: при ошибке пакета
+        # точки вычисляются повторно
+        func = self.storage.get(name)
+        if func is None or not func.capabilities.get("pure"):
+            return self.storage.compute(name, x, params)
+
+        loop = asyncio.get_running_loop()
+        key = self._key(name, params)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = _PendingBatch(name, params)
+            self._pending[key] = batch
+            batch.timer = loop.call_later(self.window_ms / 1000.0, self._flush, key)
+
+        future = loop.create_future()
+        batch.items.append((x, future, time.perf_counter()))
+        batch.points += len(x)
+
+        if batch.points >= self.max_points:
+            self._flush(key)
+
+        return await future
+
+    def _flush(self, key: Tuple[str, str]):
+        """Вычислить накопленный пакет и раздать результаты ожидающим запросам"""
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+
+        started = time.perf_counter()
+        self._record(batch, started)
+
+        joined = []
+        for x, _, _ in batch.items:
+            joined.extend(x)
+
+        try:
+            results = self.storage.compute(batch.name, joined, batch.params)
+        except Exception as error:
+            # Ошибка одного запроса не должна доставаться соседям по пакету, но
+            # повторно вычислять точки можно только для чистой функции (её могли
+            # заменить на нечистую, пока пакет ждал отправки)
+            func = self.storage.get(batch.name)
+            if len(batch.items) == 1 or func is None or not func.capabilities.get("pure"):
+                for _, future, _ in batch.items:
+                    if not future.done():
+                        future.set_exception(error)
+                return
+            for x, future, _ in batch.items:
+                if future.done():
+                    continue
+                try:
+                    future.set_result(self.storage.compute(batch.name, x, batch.params))
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for x, future, _ in batch.items:
+            if not future.done():
+                future.set_result(self._slice(results, offset, offset + len(x)))
+            offset += len(x)
+
+    @staticmethod
+    def _slice(results: Union[List[float], Dict[str, List[float]]], lo: int, hi: int):
+        """Часть результата пакета, относящаяся к одному запросу"""
+        if isinstance(results, dict):
+            return {name: column[lo:hi] for name, column in results.items()}
+        return results[lo:hi]
+
+    def _record(self, batch: _PendingBatch, started: float):
+        size = len(batch.items)
+        self._batches += 1
+        self._requests += size
+        self._points += batch.points
+        self._max_batch_requests = max(self._max_batch_requests, size)
+
+        for bound in self.SIZE_BUCKETS:
+            if size <= bound:
+                self._size_histogram[bound] += 1
+                break
+        else:
+            self._size_overflow += 1
+
+        for _, _, enqueued in batch.items:
+            delay = started - enqueued
+            self._delay_total += delay
+            self._delay_max = max(self._delay_max, delay)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Статистика по размерам пакетов и добавленной задержке"""
+        histogram = {f"<={bound}": count for bound, count in self._size_histogram.items()}
+        histogram[f">{self.SIZE_BUCKETS[-1]}"] = self._size_overflow
+
+        return {
+            "window_ms": self.window_ms,
+            "max_points": self.max_points,
+            "max_request_points": self.max_request_points,
+            "batches": self._batches,
+            "requests": self._requests,
+            "points": self._points,
+            "avg_batch_requests": self._requests / self._batches if self._batches else 0.0,
+            "avg_batch_points": self._points / self._batches if self._batches else 0.0,
+            "max_batch_requests": self._max_batch_requests,
+            "batch_size_histogram": histogram,
+            "avg_queue_delay_ms": self._delay_total / self._requests * 1000.0 if self._requests else 0.0,
+            "max_queue_delay_ms": self._delay_max * 1000.0
+        }
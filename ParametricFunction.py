@@ -1,6 +1,20 @@
-from typing import Dict, List, Any, Callable, Optional
+from typing import Dict, List, Any, Callable, Iterable, Optional, Union
+from itertools import product
 import math
 import re
+from FunctionAnalyzer import analyze
+
+
+def broadcast_size(inputs: Dict[str, Any]) -> int:
+    """
+    Число точек при поэлементном сцеплении входов (списки длины 1 и скаляры растягиваются)
+
+    :raises ValueError: Если длины списков не согласуются
+    """
+    lengths = {len(values) for values in inputs.values() if isinstance(values, list) and len(values) != 1}
+    if len(lengths) > 1:
+        raise ValueError(f"Input lengths {sorted(lengths)} cannot be broadcast together")
+    return lengths.pop() if lengths else 1
 
 
 class ParametricFunction:
@@ -33,6 +47,20 @@ class ParametricFunction:
         self._compiled_code = compile(code, f'<function {name}>', 'exec')
         self._function_obj: Optional[Callable] = None
         self._extract_function()
+        
+        self.capabilities = analyze(code, input_names=self.input_names)
+    
+    @property
+    def input_names(self) -> List[str]:
+        """Имена входных переменных (аргументы сигнатуры входа, не являющиеся параметрами)"""
+        param_names = {p.get("name") for p in self.parameters}
+        names = [name for name in self.input_signature if name not in param_names]
+        return names or ["x"]
+    
+    @property
+    def output_names(self) -> List[str]:
+        """Имена выходных значений (ключи сигнатуры выхода)"""
+        return list(self.output_signature) or ["return"]
     
     def _extract_data(self):
         """Автоматическое извлечение данных из кода функции"""
@@ -48,13 +76,21 @@ class ParametricFunction:
             if not args:
                 return
             
+            # Явно объявленные входы (например, {"x": "float", "y": "float", "t": "float"})
+            declared = dict(self.input_signature)
+            declared_params = {p.get("name") for p in self.parameters}
+            
             # Первый аргумент - x
             x_arg = args[0]
-            self.input_signature = {x_arg: "float"}
+            self.input_signature = {x_arg: declared.get(x_arg, "float")}
             
-            # Остальные аргументы - параметры
+            # Остальные аргументы - параметры, кроме объявленных входов без значений по умолчанию
             self.parameters = []
             for arg in args[1:]:
+                if '=' not in arg and arg in declared and arg not in declared_params:
+                    self.input_signature[arg] = declared[arg]
+                    continue
+                
                 if '=' in arg:
                     name, default_part = arg.split('=', 1)
                     name = name.strip()
@@ -79,7 +115,8 @@ class ParametricFunction:
                 
                 self.input_signature[name] = param_type
             
-            self.output_signature = {"return": "float"}
+            # Сигнатуру выхода с несколькими значениями задаёт пользователь
+            self.output_signature = self.output_signature or {"return": "float"}
             
         except Exception as e:
             print(f"Could not auto-extract data: {e}")
@@ -100,6 +137,13 @@ class ParametricFunction:
         
         self._function_obj = global_env['f']
     
+    def prepare(self):
+        """Подготовить функцию к вычислению (для обычных функций код уже скомпилирован)"""
+    
+    def refresh_capabilities(self):
+        """Пересчитать флаги анализатора после изменения сигнатуры или параметров"""
+        self.capabilities = analyze(self.code, input_names=self.input_names)
+    
     def get_data(self) -> Dict[str, Any]:
         """Получить данные функции (сигнатуры, параметры)"""
         return {
@@ -107,12 +151,13 @@ class ParametricFunction:
             "description": self.description,
             "input_signature": self.input_signature,
             "output_signature": self.output_signature,
-            "parameters": self.parameters
+            "parameters": self.parameters,
+            "capabilities": self.capabilities
         }
     
     def compute(self, 
                 x: List[float], 
-                params: Dict[str, float] = None) -> List[float]:
+                params: Dict[str, float] = None) -> Union[List[float], Dict[str, List[float]]]:
         """
         Вычисляет функцию для списка значений x
         
@@ -121,19 +166,97 @@ class ParametricFunction:
         :param params: Параметры для передачи в функцию
         :type params: Dict[str, float]
         :return: Вычисленные значения для списка входных значений
-        :rtype: List[float]
+                 (для нескольких выходов - словарь столбцов по именам выходов)
+        :rtype: Union[List[float], Dict[str, List[float]]]
+        """
+        x_name = self.input_names[0]
+        return self._evaluate(({x_name: xi} for xi in x), params)
+    
+    def compute_points(self,
+                       inputs: Dict[str, List[float]],
+                       params: Dict[str, float] = None) -> Union[List[float], Dict[str, List[float]]]:
+        """
+        Вычисляет функцию в точках, заданных поэлементно сцепленными списками входов
+        
+        Списки длины 1 растягиваются на длину остальных.
+        
+        :param inputs: Значения для каждого входа (например, {"x": [0, 1], "y": [2, 3], "t": [0]})
+        :type inputs: Dict[str, List[float]]
+        :param params: Параметры для передачи в функцию
+        :type params: Dict[str, float]
+        :return: Вычисленные значения в каждой точке (или столбцы по именам выходов)
+        :rtype: Union[List[float], Dict[str, List[float]]]
         """
+        columns = self._input_columns(inputs)
+        size = broadcast_size(columns)
+        
+        names = list(columns)
+        expanded = [values * size if len(values) == 1 else values for values in columns.values()]
+        return self._evaluate((dict(zip(names, point)) for point in zip(*expanded)), params)
+    
+    def compute_grid(self,
+                     axes: Dict[str, List[float]],
+                     params: Dict[str, float] = None) -> Dict[str, Any]:
+        """
+        Вычисляет функцию на декартовой сетке из значений по каждому входу
+        
+        :param axes: Значения по каждой оси (например, {"x": [0, 1, 2], "y": [0, 1]})
+        :type axes: Dict[str, List[float]]
+        :param params: Параметры для передачи в функцию
+        :type params: Dict[str, float]
+        :return: Значения в построчном порядке (последняя ось меняется быстрее всех) и форма сетки;
+                 для нескольких выходов "values" - словарь столбцов по именам выходов
+        :rtype: Dict[str, Any]
+        """
+        columns = self._input_columns(axes)
+        names = list(columns)
+        values = self._evaluate((dict(zip(names, point)) for point in product(*columns.values())), params)
+        return {
+            "axes": names,
+            "shape": [len(column) for column in columns.values()],
+            "values": values
+        }
+    
+    def _input_columns(self, inputs: Dict[str, List[float]]) -> Dict[str, List[float]]:
+        """Проверка и упорядочивание значений входов по сигнатуре входа"""
+        if not isinstance(inputs, dict):
+            raise ValueError("Inputs must be a mapping from input name to a list of values")
+        
+        names = self.input_names
+        unknown = [name for name in inputs if name not in names]
+        if unknown:
+            raise ValueError(f"Unknown inputs: {', '.join(unknown)}. Expected: {', '.join(names)}")
+        missing = [name for name in names if name not in inputs]
+        if missing:
+            raise ValueError(f"Missing inputs: {', '.join(missing)}")
+        
+        columns = {}
+        for name in names:
+            values = inputs[name]
+            if not isinstance(values, list):
+                values = [values]
+            columns[name] = values
+        return columns
+    
+    def _evaluate(self,
+                  points: Iterable[Dict[str, float]],
+                  params: Dict[str, float] = None) -> Union[List[float], Dict[str, List[float]]]:
+        """Вычисление функции в последовательности точек (значений входов)"""
         if params is None:
             params = {}
         
         if not self._function_obj:
             raise ValueError("Function not properly initialized")
         
+        outputs = self.output_names
+        if len(outputs) > 1:
+            return self._evaluate_columns(points, params, outputs)
+        
         results = []
         
-        for xi in x:
+        for point in points:
             try:
-                call_args = {'x': xi}
+                call_args = dict(point)
                 call_args.update(params)
                 
                 result = self._function_obj(**call_args)
@@ -144,10 +267,53 @@ class ParametricFunction:
                     raise ValueError(f"Function must return a number, got {type(result)}")
                     
             except Exception as e:
-                raise ValueError(f"Error computing function for x={xi}: {e}")
+                location = ", ".join(f"{name}={value}" for name, value in point.items())
+                raise ValueError(f"Error computing function for {location}: {e}")
         
         return results
     
+    def _evaluate_columns(self,
+                          points: Iterable[Dict[str, float]],
+                          params: Dict[str, float],
+                          outputs: List[str]) -> Dict[str, List[float]]:
+        """
+        Вычисление функции с несколькими выходами за один вызов на точку
+        
+        Функция возвращает кортеж (в порядке сигнатуры выхода) или словарь по именам выходов.
+        Результат собирается по столбцам: {имя выхода: список значений}.
+        """
+        columns = {name: [] for name in outputs}
+        appenders = [columns[name].append for name in outputs]
+        
+        for point in points:
+            try:
+                call_args = dict(point)
+                call_args.update(params)
+                
+                result = self._function_obj(**call_args)
+                
+                if isinstance(result, dict):
+                    missing = [name for name in outputs if name not in result]
+                    if missing:
+                        raise ValueError(f"Function result is missing outputs: {', '.join(missing)}")
+                    values = [result[name] for name in outputs]
+                elif isinstance(result, (tuple, list)) and len(result) == len(outputs):
+                    values = result
+                else:
+                    raise ValueError(f"Function must return {len(outputs)} values "
+                                     f"({', '.join(outputs)}), got {type(result)}")
+                
+                for append, value in zip(appenders, values):
+                    if not isinstance(value, (int, float)):
+                        raise ValueError(f"Function outputs must be numbers, got {type(value)}")
+                    append(float(value))
+                    
+            except Exception as e:
+                location = ", ".join(f"{name}={value}" for name, value in point.items())
+                raise ValueError(f"Error computing function for {location}: {e}")
+        
+        return columns
+    
     def to_dict(self) -> Dict[str, Any]:
         """Сериализация функции в словарь"""
         return {
@@ -0,0 +1,388 @@
+import json
+import math
+from typing import Dict, List, Any, Iterator, Tuple, Union
+
+
+DEFAULT_CHUNK_SIZE = 65536
+
+# Наибольший размер порции: размер порции задаёт клиент, а память сервера на свёртку
+# должна оставаться ограниченной
+MAX_CHUNK_SIZE = DEFAULT_CHUNK_SIZE
+
+
+def domain_size(spec: Union[List[float], Dict[str, Any]]) -> int:
+    """
+    Количество точек в описании области
+
+    :param spec: Явный список x, {"start", "stop", "step"} (stop не включается) или {"start", "stop", "num"} (stop включается)
+    :return: Число точек
+    :rtype: int
+    """
+    if isinstance(spec, list):
+        return len(spec)
+    if not isinstance(spec, dict):
+        raise ValueError("Domain must be a list of x values or a range spec")
+
+    if "start" not in spec or "stop" not in spec:
+        raise ValueError("Range spec requires 'start' and 'stop'")
+
+    start, stop = float(spec["start"]), float(spec["stop"])
+    if "num" in spec:
+        num = int(spec["num"])
+        if num < 0:
+            raise ValueError("Range 'num' must be non-negative")
+        return num
+
+    step = float(spec.get("step", 1.0))
+    if step == 0:
+        raise ValueError("Range 'step' must be non-zero")
+    return max(0, math.ceil((stop - start) / step))
+
+
+def domain_point(spec: Dict[str, Any], i: int) -> float:
+    """i-я точка области, заданной диапазоном"""
+    start, stop = float(spec["start"]), float(spec["stop"])
+    if "num" in spec:
+        num = int(spec["num"])
+        return start if num == 1 else start + i * (stop - start) / (num - 1)
+    return start + i * float(spec.get("step", 1.0))
+
+
+def domain_bounds(spec: Union[List[float], Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Индексы первой и следующей за последней точек области
+
+    Диапазон можно ограничить окном индексов {"begin": ..., "end": ...},
+    так задаются части области при распределённой свёртке.
+    """
+    total = domain_size(spec)
+    if isinstance(spec, list):
+        return 0, total
+    begin = max(0, int(spec.get("begin", 0)))
+    end = min(total, int(spec.get("end", total)))
+    return begin, max(begin, end)
+
+
+def domain_slice(spec: Union[List[float], Dict[str, Any]], lo: int, hi: int) -> Union[List[float], Dict[str, Any]]:
+    """Часть области с точками [lo, hi) в абсолютной нумерации"""
+    if isinstance(spec, list):
+        return spec[lo:hi]
+    return dict(spec, begin=lo, end=hi)
+
+
+def iter_domain(spec: Union[List[float], Dict[str, Any]],
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[float]]:
+    """
+    Обход области порциями фиксированного размера
+
+    :param spec: Явный список x или описание диапазона
+    :param chunk_size: Размер порции
+    :return: Итератор по спискам x длиной не более chunk_size
+    """
+    if chunk_size <= 0:
+        raise ValueError("Chunk size must be positive")
+
+    begin, end = domain_bounds(spec)
+
+    for lo in range(begin, end, chunk_size):
+        hi = min(lo + chunk_size, end)
+        if isinstance(spec, list):
+            yield spec[lo:hi]
+        else:
+            yield [domain_point(spec, i) for i in range(lo, hi)]
+
+
+class SumAccumulator:
+    """Сумма значений"""
+
+    def __init__(self):
+        self.total = 0.0
+
+    def update(self, xs: List[float], ys: List[float]):
+        self.total += math.fsum(ys)
+
+    def result(self) -> Dict[str, Any]:
+        return {"sum": self.total}
+
+    @staticmethod
+    def merge(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"sum": math.fsum(r["sum"] for r in results)}
+
+
+class MeanAccumulator:
+    """Среднее и дисперсия (объединение порций по формулам Чана)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, xs: List[float], ys: List[float]):
+        n = len(ys)
+        if not n:
+            return
+        chunk_mean = math.fsum(ys) / n
+        chunk_m2 = math.fsum((y - chunk_mean) ** 2 for y in ys)
+
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += chunk_m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.mean if self.count else None,
+            "variance": self.m2 / self.count if self.count else None,
+            "sample_variance": self.m2 / (self.count - 1) if self.count > 1 else None
+        }
+
+    @staticmethod
+    def merge(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        acc = MeanAccumulator()
+        for r in results:
+            n = r["count"]
+            if not n:
+                continue
+            total = acc.count + n
+            delta = r["mean"] - acc.mean
+            acc.mean += delta * n / total
+            acc.m2 += r["variance"] * n + delta * delta * acc.count * n / total
+            acc.count = total
+        return acc.result()
+
+
+class MinMaxAccumulator:
+    """Минимум и максимум вместе с аргументами, на которых они достигаются (NaN пропускаются и считаются)"""
+
+    def __init__(self):
+        self.min = None
+        self.argmin = None
+        self.max = None
+        self.argmax = None
+        self.nan = 0
+
+    def update(self, xs: List[float], ys: List[float]):
+        for xi, yi in zip(xs, ys):
+            if yi != yi:
+                self.nan += 1
+                continue
+            if self.min is None or yi < self.min:
+                self.min, self.argmin = yi, xi
+            if self.max is None or yi > self.max:
+                self.max, self.argmax = yi, xi
+
+    def result(self) -> Dict[str, Any]:
+        return {"min": self.min, "argmin": self.argmin, "max": self.max, "argmax": self.argmax,
+                "nan": self.nan}
+
+    @staticmethod
+    def merge(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        acc = MinMaxAccumulator()
+        for r in results:
+            # NaN в минимуме части бывает только от узлов, которые его не пропускали
+            if r["min"] is not None and r["min"] == r["min"] and (acc.min is None or r["min"] < acc.min):
+                acc.min, acc.argmin = r["min"], r["argmin"]
+            if r["max"] is not None and r["max"] == r["max"] and (acc.max is None or r["max"] > acc.max):
+                acc.max, acc.argmax = r["max"], r["argmax"]
+            acc.nan += r.get("nan", 0)
+        return acc.result()
+
+
+class HistogramAccumulator:
+    """Гистограмма значений на фиксированном диапазоне (NaN считаются отдельно)"""
+
+    # Ключ "range" в описании свёртки соответствует аргументу value_range
+    OPTION_NAMES = {"range": "value_range"}
+
+    def __init__(self, bins: int = 10, value_range: List[float] = None):
+        if value_range is None or len(value_range) != 2:
+            raise ValueError("Histogram requires 'range': [low, high]")
+        if int(bins) <= 0:
+            raise ValueError("Histogram 'bins' must be positive")
+        self.bins = int(bins)
+        self.low, self.high = float(value_range[0]), float(value_range[1])
+        if self.high <= self.low:
+            raise ValueError("Histogram range must satisfy low < high")
+        self.counts = [0] * self.bins
+        self.underflow = 0
+        self.overflow = 0
+        self.nan = 0
+
+    def update(self, xs: List[float], ys: List[float]):
+        scale = self.bins / (self.high - self.low)
+        for yi in ys:
+            if yi != yi:
+                self.nan += 1
+            elif yi < self.low:
+                self.underflow += 1
+            elif yi > self.high:
+                self.overflow += 1
+            else:
+                # Правая граница включается в последнюю корзину
+                self.counts[min(int((yi - self.low) * scale), self.bins - 1)] += 1
+
+    def result(self) -> Dict[str, Any]:
+        step = (self.high - self.low) / self.bins
+        return {
+            "edges": [self.low + i * step for i in range(self.bins)] + [self.high],
+            "counts": self.counts,
+            "underflow": self.underflow,
+            "overflow": self.overflow,
+            "nan": self.nan
+        }
+
+    @staticmethod
+    def merge(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        merged = dict(results[0])
+        merged["counts"] = [sum(column) for column in zip(*(r["counts"] for r in results))]
+        merged["underflow"] = sum(r["underflow"] for r in results)
+        merged["overflow"] = sum(r["overflow"] for r in results)
+        merged["nan"] = sum(r.get("nan", 0) for r in results)
+        return merged
+
+
+class CountWhereAccumulator:
+    """Количество значений, удовлетворяющих условию"""
+
+    OPERATORS = {
+        "<": lambda y, v: y < v,
+        "<=": lambda y, v: y <= v,
+        ">": lambda y, v: y > v,
+        ">=": lambda y, v: y >= v,
+        "==": lambda y, v: y == v,
+        "!=": lambda y, v: y != v
+    }
+
+    def __init__(self, op: str = ">", value: float = 0.0):
+        if op not in self.OPERATORS:
+            raise ValueError(f"Unknown count_where operator '{op}'")
+        self.op = op
+        self.value = float(value)
+        self.count = 0
+
+    def update(self, xs: List[float], ys: List[float]):
+        check = self.OPERATORS[self.op]
+        self.count += sum(1 for yi in ys if check(yi, self.value))
+
+    def result(self) -> Dict[str, Any]:
+        return {"op": self.op, "value": self.value, "count": self.count}
+
+    @staticmethod
+    def merge(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return dict(results[0], count=sum(r["count"] for r in results))
+
+
+ACCUMULATORS = {
+    "sum": SumAccumulator,
+    "mean": MeanAccumulator,
+    "variance": MeanAccumulator,
+    "minmax": MinMaxAccumulator,
+    "histogram": HistogramAccumulator,
+    "count_where": CountWhereAccumulator
+}
+
+
+def _reduction_specs(reductions: List[Union[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Проверка описаний свёрток и сопоставление их ключам ответа"""
+    if not reductions:
+        raise ValueError("At least one reduction is required")
+
+    specs = {}
+    for spec in reductions:
+        if isinstance(spec, str):
+            spec = {"type": spec}
+        if not isinstance(spec, dict) or spec.get("type") not in ACCUMULATORS:
+            raise ValueError(f"Unknown reduction: {spec}. Available: {', '.join(ACCUMULATORS)}")
+
+        key = spec.get("key", spec["type"])
+        if key in specs or key == "count":
+            raise ValueError(f"Duplicate reduction key '{key}'")
+        specs[key] = spec
+
+    return specs
+
+
+def make_accumulators(reductions: List[Union[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Создание аккумуляторов по описанию запроса
+
+    :param reductions: Имена свёрток или словари {"type": ..., <параметры>, "key": <имя в ответе>}
+    :return: Аккумуляторы по ключам ответа
+    """
+    accumulators = {}
+    # Свёртки одного класса с одинаковыми параметрами ("mean" и "variance") считаются
+    # одним аккумулятором, который отдаётся под обоими ключами
+    shared: Dict[str, Any] = {}
+    for key, spec in _reduction_specs(reductions).items():
+        accumulator = ACCUMULATORS[spec["type"]]
+        renames = getattr(accumulator, "OPTION_NAMES", {})
+        options = {renames.get(k, k): v for k, v in spec.items() if k not in ("type", "key")}
+        identity = f"{accumulator.__name__}:{json.dumps(options, sort_keys=True, default=str)}"
+        if identity not in shared:
+            try:
+                shared[identity] = accumulator(**options)
+            except TypeError as e:
+                raise ValueError(f"Invalid options for reduction '{spec['type']}': {e}")
+        accumulators[key] = shared[identity]
+
+    return accumulators
+
+
+def merge_results(reductions: List[Union[str, Dict[str, Any]]],
+                  results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Объединение результатов свёрток по частям области (в порядке следования частей)
+
+    :param reductions: Описание свёрток, по которому получены результаты
+    :param results: Результаты reduce для каждой части
+    :return: Результат свёртки по всей области
+    """
+    merged = {}
+    for key, spec in _reduction_specs(reductions).items():
+        merged[key] = ACCUMULATORS[spec["type"]].merge([r[key] for r in results])
+    merged["count"] = sum(r["count"] for r in results)
+    return merged
+
+
+def reduce(func,
+           x: Union[List[float], Dict[str, Any]],
+           params: Dict[str, float] = None,
+           reductions: List[Union[str, Dict[str, Any]]] = None,
+           chunk_size: int = DEFAULT_CHUNK_SIZE,
+           output: str = None) -> Dict[str, Any]:
+    """
+    Потоковая свёртка значений функции без хранения вектора результатов
+
+    :param func: Функция для вычисления
+    :param x: Явный список x или описание диапазона
+    :param params: Параметры функции
+    :param reductions: Список свёрток
+    :param chunk_size: Размер порции вычисления (не больше MAX_CHUNK_SIZE)
+    :param output: Выход, по которому выполняется свёртка (обязателен для функций с несколькими выходами)
+    :return: Результаты свёрток и общее число точек
+    :rtype: Dict[str, Any]
+    """
+    accumulators = make_accumulators(reductions)
+
+    outputs = func.output_names
+    if output is None and len(outputs) > 1:
+        raise ValueError(f"Function has several outputs, choose one of: {', '.join(outputs)}")
+    if output is not None and output not in outputs:
+        raise ValueError(f"Unknown output '{output}'. Available: {', '.join(outputs)}")
+
+    unique = list({id(acc): acc for acc in accumulators.values()}.values())
+
+    count = 0
+    for xs in iter_domain(x, min(int(chunk_size), MAX_CHUNK_SIZE)):
+        ys = func.compute(xs, params)
+        if isinstance(ys, dict):
+            ys = ys[output]
+        for acc in unique:
+            acc.update(xs, ys)
+        count += len(xs)
+
+    result = {key: acc.result() for key, acc in accumulators.items()}
+    result["count"] = count
+    return result
@@ -0,0 +1,105 @@
+import json
+import math
+import sys
+from array import array
+from typing import Dict, List, Any, Optional, Tuple, Union
+
+
+JSON_MEDIA_TYPE = "application/json"
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+# Значащих цифр достаточно, чтобы передать float32 без потери точности
+FLOAT32_PRECISION = 7
+
+Values = Union[List[float], Dict[str, List[float]]]
+
+
+# Обозначения нечисловых значений, которые JSON не поддерживает
+_NON_FINITE = {
+    None: ("-Infinity", "Infinity", "NaN"),
+    "g": ("-inf", "inf", "nan")
+}
+
+
+def encode_json_array(values: List[float], precision: Optional[int] = None) -> bytes:
+    """
+    Кодирование списка чисел в JSON-массив без поэлементного обхода jsonable_encoder
+
+    NaN и бесконечности передаются как null.
+
+    :param values: Список чисел
+    :param precision: Число значащих цифр (по умолчанию - точное представление)
+    :return: JSON в байтах
+    :rtype: bytes
+    """
+    if precision is None:
+        text = json.dumps(values, separators=(",", ":"))
+        tokens = _NON_FINITE[None]
+    else:
+        text = "[" + ",".join(map(f"%.{int(precision)}g".__mod__, values)) + "]"
+        tokens = _NON_FINITE["g"]
+
+    if any(token in text for token in tokens):
+        for token in tokens:
+            text = text.replace(token, "null")
+    return text.encode("ascii")
+
+
+def encode_json(result: Union[Values, Dict[str, Any]], precision: Optional[int] = None) -> bytes:
+    """
+    Кодирование результата вычисления в JSON
+
+    Массивы чисел (значения и столбцы) кодируются напрямую, остальные поля - через json.
+    Нечисловые значения, как и в массивах, передаются как null.
+    """
+    if isinstance(result, list):
+        return encode_json_array(result, precision)
+
+    parts = []
+    for key, value in result.items():
+        if isinstance(value, list) and value and isinstance(value[0], float):
+            encoded = encode_json_array(value, precision).decode("ascii")
+        elif isinstance(value, dict):
+            encoded = encode_json(value, precision).decode("ascii")
+        elif isinstance(value, float) and not math.isfinite(value):
+            encoded = "null"
+        else:
+            encoded = json.dumps(value)
+        parts.append(f"{json.dumps(key)}:{encoded}")
+    return ("{" + ",".join(parts) + "}").encode("ascii")
+
+
+def encode_binary(result: Union[Values, Dict[str, Any]], float32: bool = False) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Кодирование результата вычисления в плотный массив чисел little-endian
+
+    Столбцы нескольких выходов записываются подряд в порядке "X-Columns".
+    Для сетки форма передаётся в "X-Shape".
+
+    :param result: Список значений, столбцы или результат вычисления на сетке
+    :param float32: Использовать float32 вместо float64
+    :return: Тело ответа и заголовки с описанием раскладки
+    """
+    headers = {"X-Dtype": "float32" if float32 else "float64"}
+
+    if isinstance(result, dict) and "values" in result and "shape" in result:
+        headers["X-Shape"] = ",".join(str(n) for n in result["shape"])
+        headers["X-Axes"] = ",".join(result["axes"])
+        result = result["values"]
+
+    if isinstance(result, dict):
+        headers["X-Columns"] = ",".join(result)
+        columns = list(result.values())
+    else:
+        columns = [result]
+
+    if "X-Shape" not in headers:
+        headers["X-Shape"] = str(len(columns[0]) if columns else 0)
+
+    packed = array("f" if float32 else "d")
+    for column in columns:
+        packed.extend(column)
+    if sys.byteorder != "little":
+        packed.byteswap()
+
+    return packed.tobytes(), headers
@@ -0,0 +1,121 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Any, Optional, Tuple
+
+
+class RequestTrace:
+    """Замеры времени фаз одного запроса"""
+
+    def __init__(self, method: str = "", path: str = ""):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.attributes: Dict[str, Any] = {}
+        self.total: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Замерить фазу (повторные замеры одной фазы суммируются)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def annotate(self, **attributes):
+        """Сведения о запросе для журнала медленных запросов (функция, длина x, параметры)"""
+        self.attributes.update(attributes)
+
+    def finish(self) -> float:
+        self.total = time.perf_counter() - self.started
+        return self.total
+
+    def phase_totals_ms(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for name, seconds in self.phases:
+            totals[name] = totals.get(name, 0.0) + seconds * 1000.0
+        return totals
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing"""
+        entries = [f"{name};dur={ms:.3f}" for name, ms in self.phase_totals_ms().items()]
+        if self.total is not None:
+            entries.append(f"total;dur={self.total * 1000.0:.3f}")
+        return ", ".join(entries)
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def current_trace() -> RequestTrace:
+    """Трассировка текущего запроса (вне запроса - отдельная, никуда не записываемая)"""
+    trace = _current_trace.get()
+    if trace is None:
+        trace = RequestTrace()
+        _current_trace.set(trace)
+    return trace
+
+
+class Tracer:
+    """Трассировка запросов и журнал медленных запросов в формате JSON lines с ротацией"""
+
+    def __init__(self,
+                 slow_ms: float = 1000.0,
+                 log_path: str = "slow_requests.jsonl",
+                 max_bytes: int = 10 * 1024 * 1024,
+                 backup_count: int = 5):
+        """
+        :param slow_ms: Порог длительности запроса для записи в журнал (отрицательный - журнал выключен)
+        :param log_path: Путь к журналу медленных запросов
+        :param max_bytes: Размер файла журнала, после которого он ротируется
+        :param backup_count: Сколько старых файлов журнала хранить
+        """
+        self.slow_ms = slow_ms
+        self.log_path = log_path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._logger: Optional[logging.Logger] = None
+
+    def start(self, method: str, path: str) -> RequestTrace:
+        """Начать трассировку запроса и сделать её текущей"""
+        trace = RequestTrace(method, path)
+        _current_trace.set(trace)
+        return trace
+
+    def _get_logger(self) -> logging.Logger:
+        if self._logger is None:
+            logger = logging.getLogger("parametric_function.slow_requests")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(self.log_path, maxBytes=self.max_bytes,
+                                          backupCount=self.backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def finish(self, trace: RequestTrace, status: int):
+        """Завершить трассировку и записать запрос в журнал, если он медленный"""
+        total_ms = trace.finish() * 1000.0
+        if self.slow_ms < 0 or total_ms < self.slow_ms:
+            return
+
+        record = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "method": trace.method,
+            "path": trace.path,
+            "status": status,
+            "total_ms": round(total_ms, 3),
+            "phases_ms": {name: round(ms, 3) for name, ms in trace.phase_totals_ms().items()}
+        }
+        record.update(trace.attributes)
+
+        try:
+            self._get_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+        except Exception as e:
+            print(f"Could not write slow request log: {e}")
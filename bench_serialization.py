@@ -0,0 +1,61 @@
+"""
+Сравнение сериализации результатов вычисления: стандартный путь FastAPI
+(jsonable_encoder + JSONResponse) против прямой записи в байты из ResponseEncoding.
+
+Запуск:
+    python bench_serialization.py
+"""
+import json
+import math
+import timeit
+
+from ResponseEncoding import encode_json, encode_binary
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def fastapi_path(values):
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    return JSONResponse(content=jsonable_encoder(values)).body
+
+
+def bench(label, func, values, repeat=3):
+    number = 1 if len(values) >= 1_000_000 else 5
+    best = min(timeit.repeat(lambda: func(values), number=number, repeat=repeat)) / number
+    size = len(func(values))
+    print(f"  {label:<28} {best * 1000:10.2f} ms  {size / 1024:10.1f} KiB")
+    return best
+
+
+def main():
+    try:
+        import fastapi  # noqa: F401
+        has_fastapi = True
+    except ImportError:
+        has_fastapi = False
+        print("fastapi is not installed: the current jsonable_encoder path is NOT measured,\n"
+              "speedups below are relative to plain json.dumps")
+
+    for n in SIZES:
+        values = [math.sin(i * 0.001) * 1e3 for i in range(n)]
+        print(f"\n{n} points:")
+
+        plain = bench("json.dumps", lambda v: json.dumps(v).encode(), values)
+        baseline, baseline_label = plain, "json.dumps"
+        if has_fastapi:
+            baseline = bench("jsonable_encoder+JSONResponse", fastapi_path, values)
+            baseline_label = "jsonable_encoder"
+
+        for label, func in [
+            ("encode_json", lambda v: encode_json(v)),
+            ("encode_json precision=7", lambda v: encode_json(v, precision=7)),
+            ("encode_binary float64", lambda v: encode_binary(v)[0]),
+            ("encode_binary float32", lambda v: encode_binary(v, float32=True)[0]),
+        ]:
+            elapsed = bench(label, func, values)
+            print(f"  {'':<28} x{baseline / elapsed:.1f} vs {baseline_label}")
+
+
+if __name__ == "__main__":
+    main()
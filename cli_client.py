@@ -30,6 +30,29 @@ def run_cli(command: str, allow_fail: bool = False):
     return result
 
 
+def run_cli_batch(commands, local: bool = False, concurrency: int = 1, allow_fail: bool = False):
+    """Выполнить много команд одним запуском CLI (команды передаются через stdin)"""
+    mode = "--local " if local else ""
+    full_cmd = f'"{PYTHON}" "{CLI_PATH}" {mode}batch --concurrency {concurrency}'
+    print("\n>", full_cmd, f"({len(commands)} commands)")
+
+    result = subprocess.run(
+        full_cmd,
+        shell=True,
+        input="\n".join(commands),
+        capture_output=True,
+        text=True
+    )
+
+    print(result.stdout.strip())
+    print(result.stderr.strip())
+
+    if result.returncode != 0 and not allow_fail:
+        raise RuntimeError("CLI batch failed")
+
+    return result
+
+
 def create_function():
     run_cli(
         'create '
@@ -57,8 +80,16 @@ def list_functions():
     run_cli('list')
 
 
+def compute_many():
+    run_cli_batch(
+        [f'compute --name cubic --x "{i}" --params a=1 d={i}' for i in range(5)],
+        concurrency=4
+    )
+
+
 if __name__ == "__main__":
     list_functions()
     create_function()
     get_function_info()
     compute_function()
+    compute_many()